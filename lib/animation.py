@@ -4,31 +4,52 @@ import pygame
 from pygame.locals import *
 
 from .locals import *
-from .data import animpath
+from .data import load
+from .manifest import anim_file
 from .frame import Frame
 
 
-class Animation:
-    cached_frames = {}
+clips = {}
+
+
+def get_clip(object, anim_name):
+    """Return the Clip of an animation, loading it on first use."""
+    if (object, anim_name) not in clips:
+        clips[(object, anim_name)] = Clip(object, anim_name)
+    return clips[(object, anim_name)]
+
+
+class Clip:
+    """
+    The frames of an animation and how many times it repeats. A clip is
+    loaded once and shared by every Animation playing it, so don't modify
+    it.
+    """
     def __init__(self, object, anim_name):
-        try:
-            conffile = open(animpath(object, anim_name))
-        except:
-            try:
-                conffile = open(animpath("brown", anim_name))
-            except:
-                conffile = open(animpath("default", "static"))
-        tiley = 0
-        self.frames = []
+        conffile = load(anim_file(object, anim_name), "r")
+        frames = []
         self.repeat_times = -1
-        self.cache_name = object + anim_name
         for line in conffile.readlines():
             if line.strip() != "":
                 values = line.split()
                 if values[0] == "repeat_times":
                     self.repeat_times = int(values[1])
                 if values[0] == "frame":
-                    self.frames.append(Frame(object, anim_name, len(self.frames), int(values[2])))
+                    frames.append(Frame(object, anim_name, len(frames), int(values[2])))
+        conffile.close()
+        self.frames = tuple(frames)
+
+
+class Animation:
+    """
+    A playhead of a shared Clip. Only the position in the clip belongs to
+    the animation, so making one costs next to nothing once the clip has
+    been loaded.
+    """
+    def __init__(self, object, anim_name):
+        clip = get_clip(object, anim_name)
+        self.frames = clip.frames
+        self.repeat_times = clip.repeat_times
         self.reset()
     
     def new_load(self, location, name, cfg):
@@ -60,7 +81,8 @@ class Animation:
                     else:
                         self.i = 0
                 
-                self.image = self.frames[self.i].get_image()
+                self.frame = self.frames[self.i]
+                self.image = self.frame.get_image()
         return self.image
     
     def reset(self):
@@ -68,11 +90,19 @@ class Animation:
         self.i = 0
         self.repeated = 0
         self.finished = False
-        self.image = self.frames[self.i].get_image()
+        self.frame = self.frames[self.i]
+        self.image = self.frame.get_image()
         return
 
 
     def update_and_get_image(self):
+        return self.update_and_get_frame().get_image()
+
+    def update_and_get_frame(self):
+        """
+        Advance the animation and return the current Frame, which also
+        holds the flipped, rotated and translucent versions of its image.
+        """
         if (not self.finished):
             self.c += 1
             if (self.c > int(self.frames[self.i].get_time())):
@@ -85,9 +115,6 @@ class Animation:
                         self.finished = True
                     else:
                         self.i = 0
-                if Animation.cached_frames.has_key(self.cache_name + str(self.i)):
-                    self.image = Animation.cached_frames[self.cache_name + str(self.i)]
-                else:
-                    self.image = (self.frames[self.i]).get_image()
-                    Animation.cached_frames[self.cache_name + str(self.i)] = self.image
-        return self.image
+                self.frame = self.frames[self.i]
+                self.image = self.frame.get_image()
+        return self.frame
@@ -0,0 +1,217 @@
+"""
+Sprite atlases. All the animation frames of one object (a tileset, a
+character, an enemy...) are packed into a single surface, and frames are
+handed out as subsurfaces of it. The frames are colorkeyed and scaled to
+the resolution multiplier once per atlas instead of once per frame.
+
+The packed atlas is saved with a JSON index of the frame rects under the
+config directory, so later launches load one image per object instead of
+every frame file. The saved atlas is rebuilt when any of its frame files
+changes.
+
+At resolution multipliers other than 1, the scaled atlas is saved too, as
+raw pixels after a one-line JSON header, so it can be read back in one go
+without decoding or scaling anything.
+
+read_saved_atlas reads a saved atlas ahead of its first use without
+touching the atlases in memory, so it can run on a worker thread. What it
+read is handed over with add_saved_atlas on the main thread, and is
+checked and converted like a file read on the spot once the atlas is made.
+"""
+
+import os
+import json
+
+import pygame
+
+from .locals import *
+from .data import picpath, load
+from .util import get_config_path
+from .log import log_message, error_message
+from .manifest import frame_files
+
+
+ATLAS_VERSION = 1
+SCALED_ATLAS_VERSION = 1
+ATLAS_PADDING = 2
+ATLAS_MIN_WIDTH = 512
+COLORKEY = (255, 0, 255)
+
+atlases = {}
+
+#Saved atlases read ahead of their first use, by object: the decoded image,
+#or the raw scaled atlas at resolution multipliers other than 1
+read_ahead = {}
+
+
+def get_atlas(object):
+    """Return the atlas of an object, loading or building it on first use."""
+    if object not in atlases:
+        atlases[object] = Atlas(object)
+    return atlases[object]
+
+
+def read_saved_atlas(object):
+    """
+    Read the saved atlas of an object, decoding the image but not converting
+    it. Returns None if there is none.
+    """
+    try:
+        if MULTIPLIER != 1:
+            cache_file = open(scaled_atlas_path(object), "rb")
+            cache = cache_file.read()
+            cache_file.close()
+            return cache
+        return pygame.image.load(atlas_path(object) + ".png")
+    except Exception:
+        return None
+
+
+def add_saved_atlas(object, contents):
+    """Keep a saved atlas read by read_saved_atlas for the object's first use."""
+    if object not in atlases:
+        read_ahead[object] = contents
+
+
+def scaled_atlas_path(object):
+    return atlas_path(object) + "@" + str(MULTIPLIER) + ".bin"
+
+
+def atlas_path(object):
+    path_name = os.path.join(get_config_path(), "atlases")
+    if not os.path.exists(path_name):
+        os.mkdir(path_name)
+    return os.path.join(path_name, object)
+
+
+def pack_rects(sizes):
+    """
+    Shelf-pack frame sizes into a sheet. Takes a dict of (width, height)
+    and returns a dict of (x, y, width, height) with the same keys, plus
+    the size of the whole sheet.
+    """
+    width = ATLAS_MIN_WIDTH
+    for w, h in sizes.values():
+        width = max(width, w + ATLAS_PADDING)
+
+    rects = {}
+    x = y = shelf_height = 0
+    for key in sorted(sizes, key=lambda k: sizes[k][1], reverse=True):
+        w, h = sizes[key]
+        if x + w + ATLAS_PADDING > width:
+            x = 0
+            y += shelf_height
+            shelf_height = 0
+        rects[key] = (x, y, w, h)
+        x += w + ATLAS_PADDING
+        shelf_height = max(shelf_height, h + ATLAS_PADDING)
+    return rects, (width, max(y + shelf_height, 1))
+
+
+class Atlas:
+    def __init__(self, object):
+        self.object = object
+        self.sources = frame_files(object)
+        self.rects = {}
+        self.surface = None
+
+        if self.sources:
+            if MULTIPLIER != 1 and self.load_scaled():
+                return
+            if not self.load():
+                self.build()
+            self.scale()
+            if MULTIPLIER != 1:
+                self.save_scaled()
+
+    def load(self):
+        """Load the saved atlas, if it is up to date. Returns True on success."""
+        image = read_ahead.pop(self.object, None)
+        try:
+            index_file = open(atlas_path(self.object) + ".json")
+            index = json.load(index_file)
+            index_file.close()
+            if index["version"] != ATLAS_VERSION or index["sources"] != self.sources:
+                return False
+            if image == None:
+                image = pygame.image.load(atlas_path(self.object) + ".png")
+            self.surface = image.convert()
+        except Exception:
+            return False
+        self.rects = dict((key, tuple(rect)) for key, rect in index["rects"].items())
+        return True
+
+    def build(self):
+        """Pack the frame files of the object into a new atlas and save it."""
+        images = {}
+        for key in self.sources:
+            try:
+                images[key] = pygame.image.load(load(picpath(self.object, key)), picpath(self.object, key)).convert()
+            except pygame.error:
+                error_message("Couldn't load frame " + self.object + "_" + key)
+        self.rects, size = pack_rects(dict((key, image.get_size()) for key, image in images.items()))
+
+        self.surface = pygame.Surface(size).convert()
+        self.surface.fill(COLORKEY)
+        for key, image in images.items():
+            self.surface.blit(image, self.rects[key][:2])
+        log_message("Built sprite atlas for " + self.object)
+
+        try:
+            pygame.image.save(self.surface, atlas_path(self.object) + ".png")
+            index_file = open(atlas_path(self.object) + ".json", "w")
+            json.dump({"version": ATLAS_VERSION, "sources": self.sources, "rects": self.rects}, index_file)
+            index_file.close()
+        except Exception:
+            error_message("Couldn't save sprite atlas for " + self.object)
+
+    def scale(self):
+        # Hack for existing graphics
+        self.surface.set_colorkey(COLORKEY)
+        if MULTIPLIER == 2:
+            # special case doubling!
+            self.surface = pygame.transform.scale2x(self.surface)
+        elif MULTIPLIER != 1:
+            w, h = self.surface.get_size()
+            self.surface = pygame.transform.smoothscale(self.surface, (MULT(w), MULT(h)))
+        if MULTIPLIER != 1:
+            self.surface.set_colorkey(COLORKEY)
+            self.rects = dict((key, tuple(MULT(v) for v in rect)) for key, rect in self.rects.items())
+
+    def load_scaled(self):
+        """Load the saved scaled atlas, if it is up to date. Returns True on success."""
+        cache = read_ahead.pop(self.object, None)
+        try:
+            if cache == None:
+                cache_file = open(scaled_atlas_path(self.object), "rb")
+                cache = cache_file.read()
+                cache_file.close()
+            split = cache.index(b"\n")
+            header = json.loads(cache[:split].decode("utf_8"))
+            if (header["version"] != SCALED_ATLAS_VERSION or header["multiplier"] != MULTIPLIER
+                    or header["sources"] != self.sources):
+                return False
+            self.surface = pygame.image.fromstring(cache[split + 1:], tuple(header["size"]), "RGB").convert()
+        except Exception:
+            return False
+        self.surface.set_colorkey(COLORKEY)
+        self.rects = dict((key, tuple(rect)) for key, rect in header["rects"].items())
+        return True
+
+    def save_scaled(self):
+        header = {"version": SCALED_ATLAS_VERSION, "multiplier": MULTIPLIER, "sources": self.sources,
+                  "size": self.surface.get_size(), "rects": self.rects}
+        try:
+            cache_file = open(scaled_atlas_path(self.object), "wb")
+            cache_file.write(json.dumps(header).encode("utf_8") + b"\n")
+            cache_file.write(pygame.image.tostring(self.surface, "RGB"))
+            cache_file.close()
+        except Exception:
+            error_message("Couldn't save scaled sprite atlas for " + self.object)
+
+    def get(self, anim_name, frameno):
+        """Return a frame as a subsurface of the atlas, or None if the object doesn't have it."""
+        key = anim_name + "_" + str(frameno)
+        if key not in self.rects:
+            return None
+        return self.surface.subsurface(self.rects[key])
@@ -22,7 +22,7 @@ class Blob(DynamicObject):
     self.animations["dying"] = Animation("blob", "dying")
     self.animations["jumping"] = Animation("blob", "jumping")
     self.animations["falling"] = Animation("blob", "falling")
-    self.image = self.animations[self.current_animation].update_and_get_image()
+    self.update_image()
     self.rect = self.image.get_rect()
     self.rect.centerx = int(self.x)
     self.rect.centery = int(self.y)
@@ -56,9 +56,11 @@ class Blob(DynamicObject):
         self.current_animation = "falling"
       self.jump_queue = False
 
-    if self.current_animation != "dying" and self.rect.colliderect(self.player.rect):
-      self.die()
-      blood = self.player.take_damage(BLOB_DAMAGE)
+    if self.current_animation != "dying" and level != None:
+      for player in level.objects.overlapping(self.rect, "player"):
+        self.die()
+        blood = player.take_damage(BLOB_DAMAGE)
+        break
 
     return blood
 
@@ -1,7 +1,6 @@
 ACTION_BOX_X, ACTION_BOX_Y = 13, 13
 
 PHYSICS_RESOLUTION = 100
-PHYSICS_FPS = 120
 
 VIEW_RESOLUTIONS = {
     100: {
@@ -14,11 +13,7 @@ VIEW_RESOLUTIONS = {
     }
 }
 
-# Applies only to standard-FPS games
-VIEW_FRAMERATES = (PHYSICS_FPS, PHYSICS_FPS // 2, PHYSICS_FPS // 3, 
-                   PHYSICS_FPS // 4)
-
-# In 120fps frames; adjusted for non-standard framerates
+# In frames at 120 fps
 FLIP_FRAMES = 150
 FLIP_DELAY = 75
 
@@ -1,14 +1,47 @@
 '''Simple data loader module.
 
-Loads data files from the "data" directory shipped with a game.
+Loads data files from the "data" directory shipped with a game, or from
+the data pack next to it. Loose files in the data directory override the
+files in the pack, so the pack doesn't have to be rebuilt while working
+on the data.
 
-Enhancing this to handle caching etc. is left as an exercise for the reader.
+The path helpers return paths in the data directory whether the file is
+loose or packed. Open them with load() and check them with exists(),
+getmtime() and listdir() instead of the os functions.
 '''
 
+import io
 import os
 
+from .pack import Pack, build_pack
+
 data_py = os.path.abspath(os.path.dirname(__file__))
 data_dir = os.path.normpath(os.path.join(data_py, '..', 'data'))
+pack_path = data_dir + '.pack'
+
+pack = None
+
+def get_pack():
+    """
+    Return the data pack, opening it on first use. None if there isn't one.
+    """
+    global pack
+    if pack == None and os.path.exists(pack_path):
+        pack = Pack(pack_path)
+    return pack
+
+def make_pack():
+    """
+    Pack the data directory into the data pack.
+    """
+    build_pack(data_dir, pack_path)
+
+def data_name(path):
+    """
+    The name of a file in the data pack, from its path or its name
+    relative to the data directory.
+    """
+    return os.path.relpath(os.path.join(data_dir, path), data_dir).replace(os.sep, '/')
 
 def filepath(filename):
     """
@@ -28,11 +61,45 @@ def animpath(object, animation):
 def levelpath(levelname):
     return os.path.join(data_dir, "levels", levelname + ".txt")
 
-def load(filename, mode='rb'):
+def exists(path):
+    if os.path.exists(filepath(path)):
+        return True
+    return get_pack() != None and data_name(path) in pack.entries
+
+def getmtime(path):
     """
-    Open a file in the data directory.
+    The modification time of a file. Packed files have the pack's one.
+    """
+    if os.path.exists(filepath(path)) or get_pack() == None:
+        return os.path.getmtime(filepath(path))
+    return pack.mtime
 
-    "mode" is passed as the second arg to open().
+def listdir(path):
+    """
+    The names of the files in a directory, loose and packed.
     """
-    return open(os.path.join(data_dir, filename), mode)
+    names = set()
+    if os.path.isdir(filepath(path)):
+        names.update(os.listdir(filepath(path)))
+    if get_pack() != None:
+        names.update(pack.list(data_name(path)))
+    return sorted(names)
 
+def load(filename, mode='rb'):
+    """
+    Open a file in the data directory, or in the data pack.
+
+    "mode" is passed as the second arg to open(). Text files are decoded
+    as UTF-8. Packed files are copied once out of the pack's mapping into
+    memory files.
+    """
+    if os.path.exists(filepath(filename)) or get_pack() == None:
+        if 'b' in mode:
+            return open(filepath(filename), mode)
+        return io.open(filepath(filename), mode, encoding='utf_8')
+    contents = pack.read(data_name(filename))
+    if contents == None:
+        raise IOError("No such data file: " + filename)
+    if 'b' in mode:
+        return io.BytesIO(contents)
+    return io.StringIO(contents.decode('utf_8'))
@@ -1,76 +1,91 @@
-import pygame
+'''Frame timing for the game loop: a fixed-timestep engine clock and the cog
+deciding which of its frames get drawn.'''
+
+import time
+from timeit import default_timer
+
+from .locals import *
 
 
 class RenderCog(object):
-    def __init__(self, res, flags=0):
+    def __init__(self, fps, max_skip=MAX_FRAME_SKIP):
         """
-        @res:       The display width per tile, in pixels.
-        @flags:     Flags passed to pygame.display.set_mode().
+        @fps:       The display framerate. Frames are only ever drawn
+                    after the game logic has run, so it has to divide into
+                    the engine framerate evenly: see RENDER_FRAMERATES.
+        @max_skip:  How many frames in a row may go undrawn while the engine
+                    is catching up.
         """
-        self.set_flags(flags)
-        self.set_resolution(res, first=True)
-    
-    def set_fps(self, fps):
+        self.engine = None
         self.fps = fps
-        # Paranoia in case we got input that wasn't nicely divisible. Ensure 
-        # also that we don't accidentally round down to 0, which would cause 
-        # div/0 problems.
-        self.draw_interval = int(round(self.engine.fps / float(fps))) or 1
-    
-    def set_flags(self, flags=0):
-        self.fullscreen = flags & pygame.FULLSCREEN
-        self.flags = flags
-    
-    def set_fullscreen(self, state):
-        if self.fullscreen == state:
-            return
-        
-        self.fullscreen = not self.fullscreen
-        self.flags ^= pygame.FULLSCREEN
-        self.rebuild_screen()
-    
-    def set_resolution(self, res, first=False):
-        # We utilize Python's lazy resolution here to avoid an error the first 
-        # time this function is run
-        if not first and res == self.res:
-            return
-        self.res = res
-        
-        self.gfx.set_resolution(res)
-        
-        self.screen_res = (ACTION_BOX_X * res, ACTION_BOX_Y * res)
-        self.rebuild_screen()
-    
-    def rebuild_screen(self):
-        self.screen = pygame.display.set_mode(self.screen_res, self.flags)
-        self.rect = self.screen.get_rect()
-        self.bg_cache = pygame.Surface(self.screen_res)
-        
-        self.draw_counter = 0
-        self.draw(True)
-    
-    def draw(self, dirty_bg=False):
-        tileset = self.state.level.get_tileset()
-        self.gfx.set_tileset(tileset)
-        if dirty_bg:
-            # TODO: May switch to just using (0, 0) here instead of a rect
-            self.bg_cache.blit(self.gfx.get_bg(), self.rect)
-            for tile in self.state.level.get_tiles():
-                ...
-        self.screen.blit(self.bg_cache, self.rect)
+        self.draw_interval = 1
+        self.max_skip = max_skip
+        self.skipped = 0
 
+    def attach(self, engine):
+        self.engine = engine
+        self.set_fps(self.fps)
 
-class ActionCog(object):
-    def __init__(self, fps):
+    def set_fps(self, fps):
+        if fps <= 0 or self.engine.fps % fps != 0:
+            raise ValueError("Display framerate %r doesn't divide into %r" % (fps, self.engine.fps))
+        self.fps = fps
+        self.draw_interval = self.engine.fps // fps
+
+    def due(self):
         """
-        @fps:       The physics framerate. Should divide into the engine 
-                    framerate evenly.
+        Whether the current engine frame should be drawn. Frames are skipped
+        while the engine is behind schedule, so the game logic keeps its
+        pace on slow machines.
         """
+        if self.engine.frame % self.draw_interval != 0:
+            return False
+        if self.engine.late and self.skipped < self.max_skip:
+            self.skipped += 1
+            return False
+        self.skipped = 0
+        return True
 
 
 class StatefulEngine(object):
     def __init__(self, fps):
         """
-        @fps:       The base engine framerate. Cogs will be updated once each 
-                    frame.
+        @fps:       The base engine framerate. The game logic runs once each
+                    frame, so all the per-frame constants in locals.py are
+                    in these frames.
         """
+        self.fps = fps
+        self.frame_time = 1.0 / fps
+        self.frame = 0
+        self.late = False
+        self.next_frame = None
+        self.cogs = []
+
+    def add_cog(self, cog):
+        self.cogs.append(cog)
+        cog.attach(self)
+        return cog
+
+    def tick(self):
+        """
+        End the current frame and wait until the next one is due. Frames are
+        due on a fixed schedule, so a slow frame is made up for by not
+        waiting after the following ones. If the engine falls more than
+        MAX_FRAME_SKIP frames behind, the schedule starts over from now
+        instead of trying to catch up.
+        """
+        now = default_timer()
+        if self.next_frame == None:
+            self.next_frame = now
+        self.next_frame += self.frame_time
+
+        if now < self.next_frame:
+            self.late = False
+            time.sleep(self.next_frame - now)
+        elif now - self.next_frame > self.frame_time * MAX_FRAME_SKIP:
+            self.late = False
+            self.next_frame = now
+        else:
+            self.late = True
+
+        self.frame += 1
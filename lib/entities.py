@@ -0,0 +1,143 @@
+'''The registry of the game objects of a level, bucketed by item class and
+indexed by position.'''
+
+import pygame
+
+from .locals import *
+
+
+class SpatialHash:
+    """
+    A uniform grid of cells, each listing the objects whose area overlaps
+    it. Finding the objects around an area only looks at the cells the area
+    covers.
+    """
+    def __init__(self, cell_size):
+        self.cell_size = cell_size
+        self.cells = {}
+
+    def clear(self):
+        self.cells = {}
+
+    def cell_keys(self, rect):
+        size = self.cell_size
+        keys = []
+        for cellx in range(rect.left // size, max(rect.right - 1, rect.left) // size + 1):
+            for celly in range(rect.top // size, max(rect.bottom - 1, rect.top) // size + 1):
+                keys.append((cellx, celly))
+        return keys
+
+    def insert(self, o, rect):
+        for key in self.cell_keys(rect):
+            self.cells.setdefault(key, []).append(o)
+
+    def query(self, rect):
+        """The objects inserted with an area near the rect, each once."""
+        found = []
+        seen = set()
+        for key in self.cell_keys(rect):
+            for o in self.cells.get(key, ()):
+                if o not in seen:
+                    seen.add(o)
+                    found.append(o)
+        return found
+
+
+class EntityRegistry:
+    """
+    Keeps the objects of a level in the order they were added, and in a
+    bucket per item class ("player", "blob", "spider", "projectile", and
+    the item classes of items, like "lever" or "key"), so per-class logic
+    only has to look at the objects it cares about.
+
+    Adding and removing objects is deferred until flush is called, at the
+    end of the frame, so iterating over the registry or a bucket is stable
+    even when objects spawn or die in the middle of it. flush returns the
+    objects it added, so they can still be updated on the frame they spawn
+    on. Buckets are unordered and objects are swapped out of them in O(1).
+
+    The objects are also kept in a spatial hash for finding them by area.
+    It is rebuilt by index, once a frame after the objects have moved.
+    """
+    def __init__(self):
+        self.space = SpatialHash(SPATIAL_HASH_CELL)
+        self.objects = []
+        self.buckets = {}
+        self.bucket_index = {}
+        self.added = []
+        self.removed = set()
+
+    def __iter__(self):
+        return iter(self.objects)
+
+    def __len__(self):
+        return len(self.objects)
+
+    def of_class(self, itemclass):
+        """The objects of an item class. Don't modify the returned list."""
+        return self.buckets.get(itemclass, ())
+
+    def index(self):
+        """
+        Rebuild the spatial hash. Each object is put in with both its rect
+        and the rect it will have once moved to its current position, so the
+        hash stays valid until the objects move again.
+        """
+        self.space.clear()
+        for o in self.objects:
+            moved = o.rect.move(int(o.x) - o.rect.centerx, int(o.y) - o.rect.centery)
+            self.space.insert(o, o.rect.union(moved))
+
+    def near(self, rect, itemclass=None):
+        """
+        The objects that may be in the rect by the spatial hash, of an item
+        class if one is given. Callers do the exact test.
+        """
+        return [o for o in self.space.query(rect) if itemclass == None or o.itemclass == itemclass]
+
+    def overlapping(self, rect, itemclass=None):
+        """The objects whose rect overlaps the rect."""
+        return [o for o in self.near(rect, itemclass) if o.rect.colliderect(rect)]
+
+    def at_point(self, x, y, itemclass=None):
+        """The objects whose rect contains the point."""
+        return [o for o in self.near(pygame.Rect(int(x), int(y), 1, 1), itemclass) if o.rect.collidepoint(x, y)]
+
+    def add(self, o):
+        self.added.append(o)
+
+    def remove(self, o):
+        self.removed.add(o)
+
+    def flush(self):
+        """
+        Apply the additions and removals since the last flush. Returns the
+        objects that were added.
+        """
+        added = self.added
+        for o in added:
+            if o in self.bucket_index:
+                continue
+            bucket = self.buckets.setdefault(o.itemclass, [])
+            self.bucket_index[o] = len(bucket)
+            bucket.append(o)
+            self.objects.append(o)
+        self.added = []
+
+        if not self.removed:
+            return added
+        for o in self.removed:
+            if o not in self.bucket_index:
+                continue
+            bucket = self.buckets[o.itemclass]
+            index = self.bucket_index.pop(o)
+            last = bucket.pop()
+            if last is not o:
+                bucket[index] = last
+                self.bucket_index[last] = index
+        # The drawing order is kept, so the remaining objects are compacted
+        # in one pass
+        removed = self.removed
+        self.objects = [o for o in self.objects if o not in removed]
+        self.removed = set()
+        return added
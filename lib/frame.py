@@ -2,32 +2,41 @@ import pygame
 
 from .locals import *
 from .log import error_message
-from .data import picpath
+from .atlas import get_atlas
+from .manifest import frame_owner
 
 
 class Frame:
     def __init__(self, object, anim_name, frameno, frame_length):
-        try:
-            self.image = pygame.image.load(picpath(object, anim_name, frameno)).convert()
-        except pygame.error:
-            try:
-                self.image = pygame.image.load(picpath("brown", anim_name, frameno)).convert() #Fallback to brown tileset
-            except pygame.error:
-                self.image = pygame.image.load(picpath("object", "idle", 0)).convert() #Fallback to default object image
-                error_message("Object graphic missing: " + object + "_" +  anim_name + "_" + str(frameno))
+        owner = frame_owner(object, anim_name, frameno) #The object or the brown tileset
+        if owner != None:
+            self.image = get_atlas(owner).get(anim_name, frameno)
+        else:
+            self.image = get_atlas("object").get("idle", 0) #Fallback to default object image
+            error_message("Object graphic missing: " + object + "_" +  anim_name + "_" + str(frameno))
         self.frame_length = frame_length
-        
-        # Hack for existing graphics
-        self.image.set_colorkey((255,0,255))
-        if MULTIPLIER == 2:
-            # special case doubling!
-            self.image = pygame.transform.scale2x(self.image)
-        elif MULTIPLIER != 1:
-            w, h = self.image.get_size()
-            self.image = pygame.transform.smoothscale(self.image, (MULT(w), MULT(h)))
+        self.variants = {}
 
-    def get_image(self):
-        return self.image
+    def get_image(self, orientation=RIGHT, alpha=255):
+        """
+        Return the image facing the given way and with the given opacity.
+        The flipped, rotated and translucent versions are made the first
+        time they're needed and kept for later.
+        """
+        if orientation == RIGHT and alpha == 255:
+            return self.image
+        if (orientation, alpha) not in self.variants:
+            if orientation == LEFT:
+                image = pygame.transform.flip(self.image, True, False)
+            elif orientation == UP:
+                image = pygame.transform.rotate(self.image, 90)
+            elif orientation == DOWN:
+                image = pygame.transform.rotate(self.image, -90)
+            else:
+                image = self.image.copy()
+            image.set_alpha(alpha)
+            self.variants[(orientation, alpha)] = image
+        return self.variants[(orientation, alpha)]
 
     def get_time(self):
         return self.frame_length
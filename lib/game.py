@@ -1,23 +1,29 @@
 """
-The main game module. One big event loop in the run function plus a few helper functions.
+The main game module. One big event loop in the play_level function plus a few helper functions.
+The run function plays a level normally, simulate plays one headless for testing.
 """
 
 import pygame
 from pygame.locals import *
 import os
+import io
 import random
+from timeit import default_timer
 
 from locals import *
 from player import Player
 from spider import Spider
-from particle import Particle
-from level import Level
+from particle import ParticleSystem
+from level import Level, prefetch_level
 from sound import play_sound
 from util import *
 from variables import variables
 from log import error_message
 from trigger import Trigger
 from visibleobject import flip_direction_from_position
+from replay import ReplayRecorder, ReplayReader, replay_path
+from ghost import Ghost
+from engine import StatefulEngine, RenderCog
 import data
 
 
@@ -25,7 +31,23 @@ import data
 buttons_released = {}
 
 
-#This function renders the in-game GUI on the screen.
+class RunResult:
+    """
+    The outcome of playing a level: the end trigger, the final state of the
+    level (the player is level.player), the score and how long each frame
+    took to process, in seconds.
+    """
+    def __init__(self, end_trigger, level, score, frame_times, snapshot=None):
+        self.end_trigger = end_trigger
+        self.level = level
+        self.player = level.get_player()
+        self.score = score
+        self.frame_times = frame_times
+        self.frames = len(frame_times)
+        self.snapshot = snapshot
+
+
+#This function renders the in-game GUI on the screen, and returns the rects drawn on.
 def render_gui(screen, life, score, topleft):
     score_image = render_text("Score: " + str(score) )
     life_image = render_text("Life:")
@@ -36,13 +58,13 @@ def render_gui(screen, life, score, topleft):
     rect = score_image.get_rect()
     rect.left = topleft[0]
     rect.top = topleft[1]
-    screen.blit(score_image, rect)
+    drawn = [screen.blit(score_image, rect)]
 
     rect.left = topleft[0] + 26
     rect.top = topleft[1] + 26
     rect.width = 38
     rect.height = 8
-    pygame.draw.rect(screen, COLOR_GUI_BG, rect)
+    drawn.append(pygame.draw.rect(screen, COLOR_GUI_BG, rect))
     if life > 0:
         rect.left = topleft[0] + 27
         rect.top = topleft[1] + 27
@@ -53,13 +75,29 @@ def render_gui(screen, life, score, topleft):
     rect = life_image.get_rect()
     rect.left = topleft[0]
     rect.top = topleft[1] + 20
-    screen.blit(life_image, rect)
+    drawn.append(screen.blit(life_image, rect))
 
     rect = version_image.get_rect()
     rect.right = SCREEN_WIDTH - 2
     rect.bottom = SCREEN_HEIGHT - 2
-    screen.blit(version_image, rect)
-    return
+    drawn.append(screen.blit(version_image, rect))
+    return drawn
+
+def update_objects(objects, level, particles):
+    """
+    Update the objects of a level and take out the dead ones. Objects
+    spawned during the update are updated on the frame they spawn on, too.
+    """
+    updating = objects
+    while updating:
+        for o in updating:
+            if o.dead and o.itemclass != "player":
+                objects.remove(o)
+                continue
+            new_particles = o.update(level)
+            if type(new_particles) == list: #Sometimes the type of the return value is int (hackity hack)
+                particles.extend(new_particles)
+        updating = objects.flush()
 
 #This function parses inputs from the keyboard and returns them as an array
 def parse_inputs(joystick=None):
@@ -124,28 +162,157 @@ def parse_inputs(joystick=None):
     return inputs
 
 
-def run(screen, level_name="w0-l0", score_mod=0, score=None, joystick=None):
+def run(screen, level_name="w0-l0", score_mod=0, score=None, joystick=None, replay=None,
+        next_level=None):
+    """
+    Play a level. The run is recorded, and saved as the level's replay if the
+    level is finished. If a ReplayReader is given, its inputs are played back
+    instead, on the level it was recorded on. With the ghost setting on, the
+    saved replay of the level is shown as a ghost. If next_level is given, it
+    is prefetched while the player exits the level. The restart key starts
+    the level over without leaving this function.
+    """
+    if score == None:
+        score = Score(0)
+    if replay != None:
+        level_name = replay.level_name
+
+    ghost_track = None
+    if "ghost" in variables and variables["ghost"] and os.path.exists(replay_path(level_name)):
+        try:
+            replay_file = open(replay_path(level_name), "rb")
+            ghost_track = trace_replay(ReplayReader(replay_file))
+            replay_file.close()
+        except Exception:
+            error_message("Couldn't load the ghost of level '" + level_name + "'")
+
+    if replay != None:
+        score.life = replay.life
+        return play_level(screen, level_name, score_mod, score, joystick, input_frames=replay,
+                          seed=replay.seed, ghost_track=ghost_track).end_trigger
+
+    #Restarts play the level again from its snapshot, with the score it was started with
+    start_score = (score.score, score.life, score.time, score.levels)
+    snapshot = None
+    end_trigger = END_RESTART
+    while end_trigger == END_RESTART:
+        score.score, score.life, score.time, score.levels = start_score
+        seed = random.randint(0, 0xFFFFFFFF)
+        stream = io.BytesIO()
+        recorder = ReplayRecorder(stream, level_name, seed, score.life)
+        result = play_level(screen, level_name, score_mod, score, joystick, seed=seed,
+                            recorder=recorder, ghost_track=ghost_track,
+                            next_level=next_level, snapshot=snapshot, restartable=True)
+        recorder.close()
+        end_trigger = result.end_trigger
+        snapshot = result.snapshot
+
+    if end_trigger == END_NEXT_LEVEL:
+        try:
+            replay_file = open(replay_path(level_name), "wb")
+            replay_file.write(stream.getvalue())
+            replay_file.close()
+        except Exception:
+            error_message("Couldn't save the replay of level '" + level_name + "'")
+    return end_trigger
+
+
+def trace_replay(replay):
+    """
+    Play a replay headless and return the player's track through it,
+    as used by the Ghost class.
+    """
+    track = []
+    def trace(level):
+        player = level.get_player()
+        track.append((player.x, player.y, player.dx, player.current_animation))
+    simulate(replay.level_name, replay, None, Score(0, replay.life), replay.seed, trace)
+    return track
+
+
+def simulate(level_name, inputs, frames, score=None, seed=None, on_frame=None):
+    """
+    Play a level with no display, sound or frame limiter, as fast as it can
+    be processed. inputs is an iterable with an inputs dict for each frame,
+    with the same keys parse_inputs and the key presses in the game loop
+    produce. Stops after the given amount of frames (None for no limit), when
+    the inputs run out or when the level ends, and returns a RunResult.
+    If given, seed is used to seed the random number generator and on_frame
+    is called with the level at the end of every frame.
+    """
+    if not pygame.display.get_init():
+        os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+        pygame.display.init()
+    screen = pygame.display.get_surface()
+    if screen == None:
+        screen = pygame.display.set_mode((SCREEN_WIDTH, SCREEN_HEIGHT))
+
+    for key, default in (("character", 0), ("dialogue", True), ("devmode", False), ("verbose", False)):
+        if key not in variables:
+            variables[key] = default
+    sound = variables["sound"] if "sound" in variables else True
+    variables["sound"] = False
+    try:
+        return play_level(screen, level_name, score=score, headless=True,
+                          input_frames=inputs, max_frames=frames, seed=seed, on_frame=on_frame)
+    finally:
+        variables["sound"] = sound
+
+
+def play_level(screen, level_name="w0-l0", score_mod=0, score=None, joystick=None,
+               headless=False, input_frames=None, max_frames=None, seed=None,
+               recorder=None, ghost_track=None, on_frame=None, next_level=None,
+               snapshot=None, restartable=False):
+    """
+    The game loop behind run and simulate. The game logic runs at FPS, and
+    frames are drawn at the render_fps setting, skipping some if the game
+    falls behind. When headless, nothing is drawn and the frame rate isn't
+    limited. If input_frames is given, it is used
+    instead of the keyboard and joystick, and the level ends when it runs
+    out. The inputs of each frame are passed to the recorder, if any.
+    The next_level, if any, is prefetched when the player starts exiting.
+    If a snapshot of the level is given, the level is restored from it
+    instead of loaded. If restartable, the restart key ends the level with
+    END_RESTART, and the snapshot to restart from is returned with the
+    result.
+    """
     done = False
-    objects = []
-    particles = []
+    particles = ParticleSystem(screen)
 
     if score == None:
         score = Score(0)
     
     character = CHARACTERS[variables['character']][1]
-    #try:
-    level = Level(screen, character, level_name)
-    #except:
-    #  error_message("Couldn't open level '" + level_name + "'")
-    #  return END_QUIT
+    if snapshot != None:
+        level = snapshot.restore()
+    else:
+        #try:
+        level = Level(screen, character, level_name)
+        #except:
+        #  error_message("Couldn't open level '" + level_name + "'")
+        #  return END_QUIT
+        level.get_objects().add(level.get_player())
+        level.get_objects().flush()
+        level.get_objects().index()
 
     objects = level.get_objects()
     player = level.get_player()
-    objects.append(player)
 
     player.life = score.life
 
-    clock = pygame.time.Clock()
+    #The level as it is now, for restarting it
+    if restartable and snapshot == None:
+        snapshot = level.snapshot()
+
+    engine = StatefulEngine(FPS)
+    render_fps = FPS
+    if "render_fps" in variables:
+        render_fps = variables["render_fps"]
+    render = engine.add_cog(RenderCog(render_fps))
+
+    #The areas of the screen drawn on in the last drawn frame, for dirty rect updates
+    dirty_rects = []
+    redraw_all = True
 
     end_trigger = END_NONE
     scripted_event_on = False
@@ -176,31 +343,71 @@ def run(screen, level_name="w0-l0", score_mod=0, score=None, joystick=None):
 
     paused = False
 
+    frame = 0
+    frame_times = []
+
+    input_source = None
+    if input_frames != None:
+        input_source = iter(input_frames)
+
+    ghost = None
+    if ghost_track != None and not headless:
+        ghost = Ghost(screen, character, ghost_track)
+
+    if seed != None:
+        random.seed(seed)
+
     #Main game loop
 
-    while end_trigger == END_NONE or fading:
+    while (end_trigger == END_NONE or fading) and (max_frames == None or frame < max_frames):
+        frame_start = default_timer()
         inputs = {}
-        
+
+        #Dialogue and fades still take their time on undrawn frames
+        draw = not headless and render.due()
+        draw_screen = None
+        if draw:
+            draw_screen = screen
+
         # Pygame event and keyboard input processing
-        for event in pygame.event.get():
-            if event.type == QUIT:
-                end_trigger = END_HARD_QUIT
-            if (event.type == KEYDOWN and event.key == K_ESCAPE):
+        if not headless:
+            for event in pygame.event.get():
+                if event.type == QUIT:
+                    end_trigger = END_HARD_QUIT
+                if (event.type == KEYDOWN and event.key == K_ESCAPE):
+                    end_trigger = END_QUIT
+                    if fading == False:
+                        fading = True
+                    fade_target = FADE_STATE_HALF
+
+                if event.type == KEYDOWN and input_source == None:
+                    k = event.key
+                    if k in (K_UP, K_w, K_z):
+                        inputs["JUMP"] = True
+                    elif k in (K_DOWN, K_s):
+                        inputs["DOWN"] = True
+                    elif k in (K_p, K_PAUSE):
+                        inputs["PAUSE"] = True
+                    elif k == K_r and restartable:
+                        end_trigger = END_RESTART
+
+            if end_trigger == END_RESTART:
+                break
+
+        if input_source == None:
+            inputs.update(parse_inputs(joystick))
+        else:
+            frame_inputs = next(input_source, None)
+            if frame_inputs != None:
+                inputs.update(frame_inputs)
+            elif end_trigger == END_NONE:
+                # Out of recorded inputs, so the run ends as if Esc was pressed
                 end_trigger = END_QUIT
-                if fading == False:
-                    fading = True
+                fading = True
                 fade_target = FADE_STATE_HALF
-            
-            if event.type == KEYDOWN:
-                k = event.key
-                if k in (K_UP, K_w, K_z):
-                    inputs["JUMP"] = True
-                elif k in (K_DOWN, K_s):
-                    inputs["DOWN"] = True
-                elif k in (K_p, K_PAUSE):
-                    inputs["PAUSE"] = True
 
-        inputs.update(parse_inputs(joystick))
+        if recorder != None:
+            recorder.add_frame(inputs)
 
         trigger = None
 
@@ -228,14 +435,13 @@ def run(screen, level_name="w0-l0", score_mod=0, score=None, joystick=None):
             if "JUMP" in inputs:
                 if (player.on_ground):
                     for i in range(5):
-                        particles.append(Particle(screen, 10, player.rect.centerx - player.dx / 4 + random.uniform(-3, 3), player.rect.bottom, -player.dx * 0.1, -0.5, 0.3, level.dust_color, 4))
+                        particles.emit(10, player.rect.centerx - player.dx / 4 + random.uniform(-3, 3), player.rect.bottom, -player.dx * 0.1, -0.5, 0.3, level.dust_color, 4)
                     player.jump()
 
                     #The blobs always try to jump when the player jumps
 
-                    for o in objects:
-                        if o.itemclass == "blob":
-                            o.jump()
+                    for o in objects.of_class("blob"):
+                        o.jump()
 
             if "UP" in inputs and not player.on_ground:
                 player.jump()
@@ -276,16 +482,13 @@ def run(screen, level_name="w0-l0", score_mod=0, score=None, joystick=None):
                 level.flip(flip_direction)
                 for o in objects:
                     o.flip(flip_direction)
-                for p in particles:
-                    p.flip()
+                particles.flip()
 
         #Dust effect rising from the character's feet:
 
         if player.current_animation == "walking":
-            particles.append(
-                Particle(screen, 10, player.rect.centerx - player.dx / 2 + random.uniform(-2, 2), 
-                                 player.rect.bottom, -player.dx * 0.1, 0.1, 0.3, level.dust_color)
-            )
+            particles.emit(10, player.rect.centerx - player.dx / 2 + random.uniform(-2, 2),
+                           player.rect.bottom, -player.dx * 0.1, 0.1, 0.3, level.dust_color)
 
         #Updating level and objects:
 
@@ -301,42 +504,65 @@ def run(screen, level_name="w0-l0", score_mod=0, score=None, joystick=None):
         if changing_level:
             player.update(level)
         elif normal_updating:
-            for o in objects:
-                if o.dead and o.itemclass != "player":
-                    objects.remove(o)
-                    continue
-                new_particles = o.update(level)
-                if o.itemclass == "projectile":
-                    if player.rect.collidepoint(o.x, o.y) and o.current_animation == "default":
-                        new_particles = player.take_damage(o.damage)
-                        o.die()
-                if type(new_particles) == list: #Sometimes the type of the return value is int (hackity hack)
-                    for p in new_particles:
-                        particles.append(p)
+            update_objects(objects, level, particles)
+
+        #Objects spawned and removed during the frame are put in or taken out,
+        #and the objects are indexed by where they are now
+        objects.flush()
+        objects.index()
+
+        if normal_updating and not changing_level:
+            for o in objects.near(player.rect, "projectile"):
+                if not o.dead and player.rect.collidepoint(o.x, o.y) and o.current_animation == "default":
+                    particles.extend(player.take_damage(o.damage))
+                    o.die()
 
         if normal_updating or changing_level:
-            for p in particles:
-                p.update()
-                if p.dead:
-                    particles.remove(p)
-
-        #Rendering level - background and tiles
-        level.render()
-
-        #Rendering objects and particles
-        for o in objects:
-            if o.itemclass == "player":
-                o.render(None, None, (fading or paused))
-            else:
-                o.render(None, None, (scripted_event_on or fading or paused))
-            #On special conditions the animations aren't updated. The player is updated on a scripted event, others are not.
+            particles.update()
+
+        if ghost != None:
+            ghost.update()
+
+        if not draw:
+            #Nothing is drawn, but the animations drive parts of the game logic
+            for o in objects:
+                if o.itemclass == "player":
+                    o.animate(fading or paused)
+                else:
+                    o.animate(scripted_event_on or fading or paused)
+        else:
+            #Usually only the areas drawn on in the last drawn frame are restored.
+            #Overlays (dialogue, pause, fades) and flips need the whole screen
+            #redrawn, as does the frame after them to clear them away.
+            overlay = (level.flipping or fading or paused or scripted_event_on
+                       or Util.fade_state != FADE_STATE_NONE)
+            full_redraw = overlay or redraw_all
+            redraw_all = overlay
+
+            #Rendering level - background and tiles
+            if full_redraw:
+                level.render()
+            elif not level.render(dirty_rects):
+                full_redraw = True
+
+            #Rendering objects and particles
+            drawn_rects = []
+
+            if ghost != None and not ghost.dead:
+                drawn_rects.append(ghost.render())
+
+            for o in objects:
+                if o.itemclass == "player":
+                    drawn_rects.append(o.render(None, None, (fading or paused)))
+                else:
+                    drawn_rects.append(o.render(None, None, (scripted_event_on or fading or paused)))
+                #On special conditions the animations aren't updated. The player is updated on a scripted event, others are not.
 
-        for p in particles:
-            p.render()
+            drawn_rects.extend(particles.render())
 
-        #Rendering GUI on top of game graphics:
-        if (not paused) or (not variables["devmode"]):
-            render_gui(screen, player.life, score.score, (5, 5))
+            #Rendering GUI on top of game graphics:
+            if (not paused) or (not variables["devmode"]):
+                drawn_rects.extend(render_gui(screen, player.life, score.score, (5, 5)))
 
         # Scripted event triggering:
 
@@ -381,7 +607,7 @@ def run(screen, level_name="w0-l0", score_mod=0, score=None, joystick=None):
                     if text == None:
                         text = current_scripted_event_element.text
                         phase = 0
-                    phase = render_text_dialogue(screen, text, phase)
+                    phase = render_text_dialogue(draw_screen, text, phase)
                     if (phase == -1) and cleared:
                         current_scripted_event_element.finished = True
                         phase = 0
@@ -402,6 +628,8 @@ def run(screen, level_name="w0-l0", score_mod=0, score=None, joystick=None):
                         player.exit()
 
         if player.current_animation == "exit":
+            if not changing_level and next_level != None:
+                prefetch_level(next_level)
             changing_level = True
         elif changing_level:
             end_trigger = END_NEXT_LEVEL
@@ -416,27 +644,39 @@ def run(screen, level_name="w0-l0", score_mod=0, score=None, joystick=None):
 
         #And finally, rendering the pause button:
 
-        if paused:
+        if paused and draw:
             render_text_dialogue(screen, "Game paused. Press P to continue.", -1, "p")
 
         #Render fading on top of everything else:
 
         if (fading or Util.fade_state != FADE_STATE_NONE):
-            if fade_to_black(screen, fade_target):
+            if fade_to_black(draw_screen, fade_target):
                 #Fading finished
                 fading = False
 
         if(add_time):
             score.time += 1
 
+        if on_frame != None:
+            on_frame(level)
+
+        frame += 1
+        frame_times.append(default_timer() - frame_start)
+
         #Display, clock
 
-        pygame.display.flip()
+        if draw:
+            if full_redraw:
+                pygame.display.flip()
+            else:
+                pygame.display.update(dirty_rects + drawn_rects)
+            dirty_rects = drawn_rects
 
-        clock.tick(FPS)
+        if not headless:
+            engine.tick()
 
     #Main game loop finished
 
     score.life = player.life #To make the player's health stay the same to the next level
 
-    return end_trigger
+    return RunResult(end_trigger, level, score, frame_times, snapshot)
@@ -0,0 +1,29 @@
+'''A translucent copy of the player, following the track of a recorded run.'''
+
+from .locals import *
+from .player import Player
+from .visibleobject import VisibleObject
+
+
+class Ghost(Player):
+
+  def __init__(self, screen, character, track):
+    """track is a list of (x, y, dx, animation) tuples, one for each frame."""
+    Player.__init__(self, screen, character)
+    self.itemclass = "ghost"
+    self.track = track
+    self.track_frame = 0
+
+  def update(self, level = None):
+    if self.track_frame >= len(self.track):
+      self.dead = True
+      return
+    self.x, self.y, self.dx, animation = self.track[self.track_frame]
+    if animation != self.current_animation:
+      self.animations[animation].reset()
+      self.current_animation = animation
+    self.track_frame += 1
+
+  def render(self, surface = None, center = None, static_render = False):
+    if not self.dead:
+      return VisibleObject.render(self, surface, center, static_render, GHOST_ALPHA)
@@ -1,5 +1,6 @@
 from .visibleobject import VisibleObject
 from .animation import Animation
+from .manifest import has_animation
 from .trigger import Trigger
 
 
@@ -9,12 +10,12 @@ class Item(VisibleObject):
     VisibleObject.__init__(self, screen, x, y)
     self.animations["default"] = Animation(set, itemclass)
 
-    try:
+    if has_animation(set, itemclass + "_broken"):
       self.animations["broken"] = Animation(set, itemclass + "_broken")
-    except:
+    else:
       self.animations["broken"] = self.animations["default"]
 
-    self.image = self.animations[self.current_animation].update_and_get_image()
+    self.update_image()
     self.rect = self.image.get_rect()
     self.itemclass = itemclass
     self.activated_times = 0
@@ -1,24 +1,38 @@
-import os
-import codecs
+import threading
 
-import pytmx
 import pygame
 from pygame.locals import *
 
 from .locals import *
-from .data import levelpath, filepath
-from .util import dir_from_str, all_collided, get_edges
+from .util import dir_from_str, all_collided
 from .log import error_message, log_message
-from .tile import Tile
-from .spikes import Spikes
+from .tile import get_tile_kind
 from .item import Item
 from .player import Player
 from .spider import Spider
 from .blob import Blob
-from .scripted_event import Scripted_event
+from .entities import EntityRegistry, SpatialHash
+from .levelcache import get_level_data, read_level_data, add_level_data
+from .atlas import atlases, read_saved_atlas, add_saved_atlas
+from .scripted_event import Scripted_event, Scripted_event_element
 from .animation import Animation
 from .trigger import Trigger
-from .visibleobject import tile_coords_to_screen_coords
+from .visibleobject import VisibleObject, FLIP_ROTATIONS, tile_coords_to_screen_coords
+from .snapshot import Snapshot
+
+
+#States of the per-cell ground check cache
+GROUND_UNKNOWN = 0
+GROUND_EMPTY = 1
+GROUND_SOLID = 2
+GROUND_MIXED = 3
+
+#The tile type code of spikes, which hurt
+SPIKES_CODE = ord("S")
+
+#Worker threads reading the files of upcoming levels, and the dicts they
+#read them into, by level name
+prefetches = {}
 
 
 class Change:
@@ -27,32 +41,125 @@ class Change:
         self.coords = coords
 
 
-class UnknownTileException(Exception):
-    pass
-
-
-def get_tile_type(path):
-    base = os.path.basename(path)
-    for keyword in TILE_TYPE_MAP:
-        if keyword in base:
-            return TILE_TYPE_MAP[keyword]
-    raise UnknownTileException(path)
+def rotate_faces(faces, flip_direction):
+    """
+    Rotate an exposed faces bitmask along with the level. The direction
+    indexes go clockwise, so this is a 4-bit rotation.
+    """
+    if flip_direction == CLOCKWISE:
+        return ((faces << 1) | (faces >> 3)) & ALL_FACES
+    return ((faces >> 1) | (faces << 3)) & ALL_FACES
+
+
+def rotate_cells(cells, flip_direction, rotate_value=None):
+    """
+    Return a copy of a FULL_TILES_HOR x FULL_TILES_VER grid with every value
+    moved to the cell its tile ends up in after flipping. rotate_value, if
+    given, is applied to each moved value.
+    """
+    rotated = [[None] * FULL_TILES_VER for tilex in range(FULL_TILES_HOR)]
+    for tilex in range(FULL_TILES_HOR):
+        for tiley in range(FULL_TILES_VER):
+            if flip_direction == CLOCKWISE:
+                newx, newy = FULL_TILES_VER - tiley - 1, tilex
+            else:
+                newx, newy = tiley, FULL_TILES_HOR - tilex - 1
+            value = cells[tilex][tiley]
+            if rotate_value != None:
+                value = rotate_value(value, flip_direction)
+            rotated[newx][newy] = value
+    return rotated
+
+
+def segment_rect_entry(x, y, dx, dy, rect, t_min, t_max):
+    """
+    Return the fraction of the segment from (x, y) to (x + dx, y + dy) at
+    which it enters a rect, looking only between t_min and t_max. Returns
+    None if the segment misses the rect there.
+    """
+    for start, delta, low, high in ((x, dx, rect.left, rect.right), (y, dy, rect.top, rect.bottom)):
+        if delta == 0:
+            if not low <= start < high:
+                return None
+            continue
+        t_low = (low - start) / float(delta)
+        t_high = (high - start) / float(delta)
+        if t_low > t_high:
+            t_low, t_high = t_high, t_low
+        t_min = max(t_min, t_low)
+        t_max = min(t_max, t_high)
+        if t_min > t_max:
+            return None
+    return t_min
+
+
+def prefetch_level(level_name):
+    """
+    Start reading the files of a level on a worker thread: the compiled
+    level and the saved atlases of its tilesets. The worker doesn't touch
+    the caches in memory or the display, so the level is still built on
+    the main thread, from what the worker read.
+    """
+    if level_name in prefetches:
+        return
+    files = {}
+    thread = threading.Thread(target=prefetch_worker, args=(level_name, files, set(atlases)))
+    thread.daemon = True
+    prefetches[level_name] = (thread, files)
+    thread.start()
+
+
+def prefetch_worker(level_name, files, loaded_atlases):
+    #If the prefetch fails, the level is read again when it's built and fails there
+    try:
+        data = read_level_data(level_name)
+        files["data"] = data
+        objects = set([data.tile_set, data.set, data.set + "_background"])
+        objects.update(object_set for values, object_set in data.objects)
+        files["atlases"] = dict((object, read_saved_atlas(object)) for object in objects
+                                if object not in loaded_atlases)
+    except Exception:
+        error_message("Couldn't prefetch level " + level_name)
+
+
+def finish_prefetch(level_name):
+    """Wait for the prefetch of a level, if there is one, and keep what it read."""
+    if level_name not in prefetches:
+        return
+    thread, files = prefetches.pop(level_name)
+    thread.join()
+    if "data" in files:
+        add_level_data(files["data"])
+    for object, contents in files.get("atlases", {}).items():
+        if contents != None:
+            add_saved_atlas(object, contents)
 
 
 class Level:
     def __init__(self, screen, character, level_name="w0-l0"):
         self.screen = screen
         self.image = None
+        #The background and tiles drawn together, by orientation, and the
+        #cells of each that have changed since it was drawn
+        self.images = {}
+        self.stale_cells = dict((orientation, set()) for orientation in range(4))
         self.flipping = False
         self.flipcounter = 0
         self.set = "brown"  #The default tileset, can be changed through level configuration
 
-        self.tiles = []
-        self.objects = []
+        #Tile type codes by cell, 0 for no tile. The tiles use the tileset
+        #the level declared before them.
+        self.tile_types = [bytearray(FULL_TILES_VER) for tilex in range(FULL_TILES_HOR)]
+        self.tile_set = "brown"
+        #The tiles as they were when the flip started, turned while flipping
+        self.flip_tiles = None
+        self.flip_direction = CLOCKWISE
+        self.exposed_faces = [[0] * FULL_TILES_VER for tilex in range(FULL_TILES_HOR)]
+        self.objects = EntityRegistry()
 
         self.scripted_events = []
 
-        self.cached_ground_check = {}
+        self.ground_cells = [[GROUND_UNKNOWN] * FULL_TILES_VER for tilex in range(FULL_TILES_HOR)]
 
         self.dust_color = COLOR_DUST["brown"]
 
@@ -60,93 +167,29 @@ class Level:
 
         self.orientation = 0
 
-        conffile = codecs.open(levelpath(self.level_name), "r", "utf_8")
+        finish_prefetch(self.level_name)
+        data = get_level_data(self.level_name)
 
-        tiley = 0
-        values = []
+        self.set = self.tile_set = data.tile_set
+        for tiley in range(FULL_TILES_VER):
+            for tilex in range(FULL_TILES_HOR):
+                tile_type = data.get_tile(tilex, tiley)
+                if tile_type != None:
+                    self.add_tile(tile_type, (tilex, tiley))
 
-        trigger = False
-        current_event = None
+        for values, object_set in data.objects:
+            self.set = object_set
+            self.spawn_object(values, character)
+        self.set = data.set
 
-        parse_tiles = False
+        for trigger_type, times, elements in data.events:
+            event = Scripted_event(trigger_type, times)
+            for tokens in elements:
+                event.add_tokens(tokens)
+            self.scripted_events.append(event)
 
-        for line in conffile:
-
-            if parse_tiles:
-                if tiley < FULL_TILES_VER:
-                    tilex = 0
-                    while tilex < FULL_TILES_VER:
-                        if (line[tilex] == "W") or (line[tilex] == "B") or (line[tilex] == "S"):
-                            self.add_tile(line[tilex], (tilex, tiley))
-                        tilex += 1
-                    tiley += 1
-                    continue
-                else:
-                    parse_tiles = False
-                    continue
-
-            elif line.strip() != "":
-                    values = line.split()
-
-                    #Parsing special commands
-
-                    if trigger:
-                        if values[0] == "end" and values[1] == "trigger":
-                            trigger = False
-                        else:
-                            current_event.add_element(line)
-                        continue
-
-                    elif values[0] == "trigger":
-                        trigger = True
-                        current_event = Scripted_event(values[1], int(values[2]))
-                        self.scripted_events.append(current_event)
-                        continue
-
-                    elif values[0] == "set":
-                        # Original tileset declaration
-                        self.set = values[1]
-                        continue
-
-                    elif values[0] == "tiles":
-                        # Original tilemap header
-                        if len(values) == 1:
-                            parse_tiles = True
-                            continue
-
-                        # Parse a TMX
-                        path = filepath(line.split(None, 1)[1].strip())
-                        tmx = pytmx.pytmx.TiledMap(path)
-                        for x, y, image in tmx.layers[0].tiles():
-                            tile_type = get_tile_type(image[0])
-                            self.add_tile(tile_type, (x, y))
-                        self.set = tmx.tilesets[0].name
-                        continue
-
-
-                    #Parsing objects
-                    x, y = tile_coords_to_screen_coords(values[1], values[2])
-
-                    if values[0] == "player":
-                        self.player = Player(self.screen, character, x, y)
-
-                    elif values[0] == "spider":
-                        self.objects.append(Spider( self.screen, x, y, dir_from_str(values[3]) ))
-
-                    elif values[0] == "blob":
-                        self.objects.append(Blob(self.screen, x, y, self.player))
-
-                    elif values[0] == "lever":
-                        trigger_type = TRIGGER_FLIP
-                        if values[4] == "TRIGGER_FLIP":
-                            trigger_type = TRIGGER_FLIP
-                        self.objects.append( Item(self.screen, x, y, self.set, values[0], int(values[3]), trigger_type) )
-
-                    else:
-                        try:
-                            self.objects.append(Item(self.screen, x, y, self.set, values[0]))
-                        except:
-                            error_message("Couldn't add object '" + values[0] + "'")
+        self.objects.flush()
+        self.objects.index()
 
         self.dust_color = COLOR_DUST[self.set]
 
@@ -156,8 +199,6 @@ class Level:
         self.rect = (self.bg_animations[self.current_animation].update_and_get_image()).get_rect()
         self.rect.centerx = SCREEN_WIDTH / 2
         self.rect.centery = SCREEN_HEIGHT / 2
-
-        self.reset_active_tiles()
         return
 
     def update(self):
@@ -167,92 +208,408 @@ class Level:
             if self.flipcounter > FLIP_FRAMES:
                 self.flipcounter = 0
                 self.flipping = False
-                self.reset_active_tiles()
+                self.finish_flip()
                 return_trigger = TRIGGER_FLIPPED
-                self.image = None
-            for t in self.tiles:
-                t.update()
         return return_trigger
 
-    def reset_active_tiles(self):
-        self.active_tiles = []
-        for t in self.tiles:
-            if (t.x > 0 and t.y > 0):
-                self.active_tiles.append(t)
+    def tile_kind(self, tilex, tiley):
+        """The TileKind of the tile in a cell, or None if the cell is empty."""
+        code = self.tile_types[tilex][tiley]
+        if code == 0:
+            return None
+        return get_tile_kind(self.tile_set, chr(code))
+
+    def rotate_exposed_faces(self, flip_direction):
+        """
+        Move the exposed faces masks to the cells their tiles flip to, and
+        rotate the masks themselves the same way.
+        """
+        self.exposed_faces = rotate_cells(self.exposed_faces, flip_direction, rotate_faces)
         return
 
+    def update_exposed_faces(self, tilex, tiley):
+        """
+        Recompute the exposed faces masks of a cell and its four neighbours.
+        A face is exposed when there's no tile next to it.
+        """
+        for x, y in ((tilex, tiley), (tilex + 1, tiley), (tilex - 1, tiley),
+                     (tilex, tiley + 1), (tilex, tiley - 1)):
+            if not (0 <= x < FULL_TILES_HOR and 0 <= y < FULL_TILES_VER):
+                continue
+            faces = 0
+            if self.tile_types[x][y]:
+                if not self.find_tile(x + 1, y):
+                    faces |= 1 << RIGHT
+                if not self.find_tile(x - 1, y):
+                    faces |= 1 << LEFT
+                if not self.find_tile(x, y + 1):
+                    faces |= 1 << DOWN
+                if not self.find_tile(x, y - 1):
+                    faces |= 1 << UP
+            self.exposed_faces[x][y] = faces
+        return
+
+    def tiles_in_area(self, left, top, right, bottom):
+        """
+        Return the visible tiles that may touch the given screen area, as
+        (tilex, tiley, rect) tuples. Only the grid cells the area covers are
+        looked at, with a pixel of slack for tiles that don't fill their cell
+        exactly (spikes). While the level is flipping the tiles are between
+        cells and nothing collides with them.
+        """
+        if self.flipping:
+            return []
+
+        offset_x = FULL_TILES_HOR - TILES_HOR
+        offset_y = FULL_TILES_VER - TILES_VER
+        min_x = max(int((left - 1) // TILE_DIM) + offset_x, offset_x)
+        max_x = min(int((right + 1) // TILE_DIM) + offset_x, FULL_TILES_HOR - 1)
+        min_y = max(int((top - 1) // TILE_DIM) + offset_y, offset_y)
+        max_y = min(int((bottom + 1) // TILE_DIM) + offset_y, FULL_TILES_VER - 1)
+
+        found = []
+        for tilex in range(min_x, max_x + 1):
+            column = self.tile_types[tilex]
+            for tiley in range(min_y, max_y + 1):
+                if column[tiley]:
+                    found.append((tilex, tiley, get_tile_kind(self.tile_set, chr(column[tiley])).get_rect(tilex, tiley)))
+        return found
+
+    def spawn_object(self, values, character):
+        """Create an object from the values of its line in the level file."""
+        x, y = tile_coords_to_screen_coords(values[1], values[2])
+
+        if values[0] == "player":
+            self.player = Player(self.screen, character, x, y)
+
+        elif values[0] == "spider":
+            self.objects.add(Spider( self.screen, x, y, dir_from_str(values[3]) ))
+
+        elif values[0] == "blob":
+            self.objects.add(Blob(self.screen, x, y, self.player))
+
+        elif values[0] == "lever":
+            trigger_type = TRIGGER_FLIP
+            if values[4] == "TRIGGER_FLIP":
+                trigger_type = TRIGGER_FLIP
+            self.objects.add( Item(self.screen, x, y, self.set, values[0], int(values[3]), trigger_type) )
+
+        else:
+            try:
+                self.objects.add(Item(self.screen, x, y, self.set, values[0]))
+            except:
+                error_message("Couldn't add object '" + values[0] + "'")
+
     def get_objects(self):
         return self.objects
 
+    #Adds an object to the level at the end of the frame
+    def spawn(self, o):
+        self.objects.add(o)
+
     def get_player(self):
         return self.player
 
     def get_scripted_events(self):
         return self.scripted_events
 
-    #Renders the background and the tiles
-    def render(self):
-        if self.flipping or self.image == None or self.edited:
+    #Records the state of the level, its tiles, objects and scripted events.
+    #Restoring the snapshot puts the level back the way it was, and returns it.
+    def snapshot(self):
+        return Snapshot(self, (Level, VisibleObject, Animation, EntityRegistry, SpatialHash,
+                               Scripted_event, Scripted_event_element, Trigger))
+
+    #Renders the background and the tiles. If a list of rects is given, only
+    #those areas of the screen are restored, unless the cached background had
+    #to be rebuilt. Returns False if the whole level was drawn.
+    def render(self, rects = None):
+        if self.flipping:
+            #The turning tile layer goes straight on the screen
+            self.screen.blit(self.bg_animations[self.current_animation].update_and_get_image(), self.rect)
+            self.render_flipping_tiles(self.screen)
+            return False
+
+        orientation = self.orientation % 4
+        if orientation not in self.images:
             self.image = pygame.Surface((self.rect.width, self.rect.height))
             bg = self.bg_animations[self.current_animation].update_and_get_image()
             self.image.blit(bg, self.rect)
-            for t in self.tiles:
-                t.render(self.image)
-            self.edited = False
+            self.render_tiles(self.image)
+            self.images[orientation] = self.image
+            self.stale_cells[orientation] = set()
+            rects = None
+        else:
+            self.image = self.images[orientation]
+            if self.stale_cells[orientation]:
+                for tilex, tiley in self.stale_cells[orientation]:
+                    self.render_cell(self.image, tilex, tiley)
+                self.stale_cells[orientation] = set()
+                rects = None
 
         #Blits the cached background
-        self.screen.blit(self.image, self.rect)
+        if rects == None:
+            self.screen.blit(self.image, self.rect)
+            return False
+        for r in rects:
+            self.screen.blit(self.image, r, r.move(-self.rect.left, -self.rect.top))
+        return True
+
+    def render_tiles(self, surface):
+        for tilex in range(FULL_TILES_HOR - TILES_HOR, FULL_TILES_HOR):
+            for tiley in range(FULL_TILES_VER - TILES_VER, FULL_TILES_VER):
+                kind = self.tile_kind(tilex, tiley)
+                if kind != None:
+                    surface.blit(kind.image, kind.get_rect(tilex, tiley))
+        return
+
+    def render_cell(self, surface, tilex, tiley):
+        """Redraw the background and the tile of a visible grid cell."""
+        cell = self.grid_cell_rect(tilex, tiley)
+        bg = self.bg_animations[self.current_animation].update_and_get_image()
+        surface.blit(bg, cell, cell.move(-self.rect.left, -self.rect.top))
+        kind = self.tile_kind(tilex, tiley)
+        if kind != None:
+            surface.blit(kind.image, kind.get_rect(tilex, tiley))
         return
 
+    def forget_image_cell(self, tilex, tiley):
+        """
+        Mark a cell that was edited to be redrawn in the cached images of
+        every orientation, where it is visible.
+        """
+        orientation = self.orientation
+        if self.flipping:
+            # The grid is only turned at the end of the flip
+            orientation -= self.flip_direction
+        for turns in range(4):
+            visible_x = tilex - (FULL_TILES_HOR - TILES_HOR)
+            visible_y = tiley - (FULL_TILES_VER - TILES_VER)
+            if 0 <= visible_x < TILES_HOR and 0 <= visible_y < TILES_VER:
+                self.stale_cells[(orientation + turns) % 4].add((tilex, tiley))
+            tilex, tiley = FULL_TILES_VER - tiley - 1, tilex
+        return
+
+    def render_flipping_tiles(self, surface):
+        """
+        Draw the tile layer snapshot turned around the center of the play
+        area by the part of the flip done so far. The tiles move along with
+        their cells, but stay upright like they're drawn when not flipping,
+        so the last frame of the flip leads straight into the level at rest.
+        """
+        cos_angle, sin_angle = FLIP_ROTATIONS[self.flip_direction][self.flipcounter]
+        blit_list = []
+        for image, rela_x, rela_y, left, top in self.flip_tiles:
+            x = PLAY_AREA_CENTER_X + cos_angle * rela_x - sin_angle * rela_y
+            y = PLAY_AREA_CENTER_Y + sin_angle * rela_x + cos_angle * rela_y
+            blit_list.append((image, (int(round(x)) + left, int(round(y)) + top)))
+        if hasattr(surface, "blits"):
+            surface.blits(blit_list)
+            return
+        #Older pygame versions don't have blits
+        for image, position in blit_list:
+            surface.blit(image, position)
+        return
+
+    def tile_layer(self):
+        """
+        List all the tiles of the grid, visible or not, for turning them
+        during a flip: the image of each tile, the center of its cell
+        relative to the center of the play area, and the offset of the image
+        from the center of the cell.
+        """
+        layer = []
+        for tilex in range(FULL_TILES_HOR):
+            for tiley in range(FULL_TILES_VER):
+                kind = self.tile_kind(tilex, tiley)
+                if kind != None:
+                    cell = self.grid_cell_rect(tilex, tiley)
+                    rect = kind.get_rect(tilex, tiley)
+                    layer.append((kind.image, cell.centerx - PLAY_AREA_CENTER_X, cell.centery - PLAY_AREA_CENTER_Y,
+                                  rect.left - cell.centerx, rect.top - cell.centery))
+        return layer
+
     #Starts the flipping of the level
     def flip(self, flip_direction = CLOCKWISE):
         if self.flipping:
             return
         else:
-            self.cached_ground_check = {}
             self.flipping = True
             if (flip_direction == CLOCKWISE):
                 self.orientation += 1
             if (flip_direction == COUNTER_CLOCKWISE):
                 self.orientation -= 1
-            for t in self.tiles:
-                t.flip(flip_direction)
+            self.flip_direction = flip_direction
+            self.flip_tiles = self.tile_layer()
             return
 
+    def finish_flip(self):
+        """Move the tiles to the cells they flipped to, all at once."""
+        self.tile_types = [bytearray(column) for column in rotate_cells(self.tile_types, self.flip_direction)]
+        self.rotate_exposed_faces(self.flip_direction)
+        # Tiles never reach outside their cells, so the cached states
+        # are still valid once they have moved along with the tiles
+        self.ground_cells = rotate_cells(self.ground_cells, self.flip_direction)
+        self.flip_tiles = None
+        return
+
     #Triggers an object in the position specified
     def trigger(self, x, y):
-        for o in self.objects:
-            if o.rect.collidepoint(x, y):
-                if o.itemclass == "lever":
-                    trigg = o.activate()
-                    if trigg != None:
-                        return trigg
+        for o in self.objects.at_point(x, y, "lever"):
+            trigg = o.activate()
+            if trigg != None:
+                return trigg
         return None
 
 
     #Gives an object from the level (also removes it from the level)
     def pick_up(self, x, y):
-        for o in self.objects:
-            if o.rect.collidepoint(x, y):
-                if o.pickable:
-                    self.objects.remove(o)
-                    return o
+        for o in self.objects.at_point(x, y):
+            if o.pickable:
+                self.objects.remove(o)
+                return o
         return None
 
 
     #Checks the point for solid ground
     def ground_check(self, x, y):
-        if (x, y) in self.cached_ground_check:
-            return self.cached_ground_check[(x, y)]
-        else:
-            if x > SCREEN_WIDTH or y > SCREEN_HEIGHT or x < 0 or y < 0:
+        if x > SCREEN_WIDTH or y > SCREEN_HEIGHT or x < 0 or y < 0:
+            return True
+
+        tilex = int(x // TILE_DIM) + FULL_TILES_HOR - TILES_HOR
+        tiley = int(y // TILE_DIM) + FULL_TILES_VER - TILES_VER
+        if self.flipping or tilex >= FULL_TILES_HOR or tiley >= FULL_TILES_VER:
+            # The tiles are on the move or the point is on the far edge of the
+            # screen, neither of which is worth caching
+            return self.point_on_tiles(x, y)
+
+        state = self.ground_cells[tilex][tiley]
+        if state == GROUND_UNKNOWN:
+            state = self.check_ground_cell(tilex, tiley)
+            self.ground_cells[tilex][tiley] = state
+        if state == GROUND_MIXED:
+            return self.point_on_tiles(x, y)
+        return state == GROUND_SOLID
+
+    def point_on_tiles(self, x, y):
+        for tilex, tiley, rect in self.tiles_in_area(x, y, x, y):
+            if rect.collidepoint(x, y):
                 return True
-            for t in self.active_tiles:
-                if t.rect.collidepoint(x, y):
-                    self.cached_ground_check[(x, y)] = True
-                    return True
-            self.cached_ground_check[(x, y)] = False
-            return False
+        return False
+
+    def sweep(self, x0, y0, x1, y1):
+        """
+        Follow the segment from (x0, y0) to (x1, y1) through the tile grid,
+        cell by cell, and return the first point of it that is on solid
+        ground (as in ground_check), or None if there isn't one. Leaving the
+        screen counts as hitting ground at the edge. Only the cells the
+        segment crosses are looked at, so fast objects can't skip over thin
+        walls.
+        """
+        if self.flipping or not (0 <= x0 <= SCREEN_WIDTH and 0 <= y0 <= SCREEN_HEIGHT):
+            if self.ground_check(x1, y1):
+                return (x1, y1)
+            return None
+
+        dx = x1 - x0
+        dy = y1 - y0
+
+        # The part of the segment on the screen
+        t_end = 1.0
+        if x1 > SCREEN_WIDTH:
+            t_end = min(t_end, (SCREEN_WIDTH - x0) / float(dx))
+        elif x1 < 0:
+            t_end = min(t_end, -x0 / float(dx))
+        if y1 > SCREEN_HEIGHT:
+            t_end = min(t_end, (SCREEN_HEIGHT - y0) / float(dy))
+        elif y1 < 0:
+            t_end = min(t_end, -y0 / float(dy))
+
+        cellx = min(int(x0 // TILE_DIM), TILES_HOR - 1)
+        celly = min(int(y0 // TILE_DIM), TILES_VER - 1)
+        step_x = step_y = 0
+        next_x = next_y = 2.0
+        if dx != 0:
+            step_x = 1 if dx > 0 else -1
+            next_x = ((cellx + (dx > 0)) * TILE_DIM - x0) / float(dx)
+        if dy != 0:
+            step_y = 1 if dy > 0 else -1
+            next_y = ((celly + (dy > 0)) * TILE_DIM - y0) / float(dy)
+
+        t = 0.0
+        while t <= t_end:
+            t_out = min(next_x, next_y, t_end)
+            hit = self.sweep_cell(cellx + FULL_TILES_HOR - TILES_HOR, celly + FULL_TILES_VER - TILES_VER,
+                                  x0, y0, dx, dy, t, t_out)
+            if hit != None:
+                return (x0 + dx * hit, y0 + dy * hit)
+            if t_out == t_end:
+                break
+            if next_x < next_y:
+                t = next_x
+                cellx += step_x
+                next_x += TILE_DIM / float(abs(dx))
+            else:
+                t = next_y
+                celly += step_y
+                next_y += TILE_DIM / float(abs(dy))
+            if not (0 <= cellx < TILES_HOR and 0 <= celly < TILES_VER):
+                break
+
+        if t_end < 1.0:
+            return (x0 + dx * t_end, y0 + dy * t_end)
+        return None
+
+    def sweep_cell(self, tilex, tiley, x, y, dx, dy, t_in, t_out):
+        """
+        Find where a segment crossing a visible grid cell between t_in and
+        t_out first hits a tile in it, as a fraction of the segment.
+        """
+        state = self.ground_cells[tilex][tiley]
+        if state == GROUND_UNKNOWN:
+            state = self.check_ground_cell(tilex, tiley)
+            self.ground_cells[tilex][tiley] = state
+        if state == GROUND_EMPTY:
+            return None
+        if state == GROUND_SOLID:
+            return t_in
+
+        hit = None
+        cell = self.grid_cell_rect(tilex, tiley)
+        for tile_x, tile_y, rect in self.tiles_in_area(cell.left, cell.top, cell.right - 1, cell.bottom - 1):
+            t = segment_rect_entry(x, y, dx, dy, rect, t_in, t_out)
+            if t != None and (hit == None or t < hit):
+                hit = t
+        return hit
+
+    def check_ground_cell(self, tilex, tiley):
+        """
+        Find out whether a visible grid cell is entirely solid, entirely empty
+        or partially covered by tiles, for the ground check cache.
+        """
+        cell = self.grid_cell_rect(tilex, tiley)
+        state = GROUND_EMPTY
+        for tile_x, tile_y, rect in self.tiles_in_area(cell.left, cell.top, cell.right - 1, cell.bottom - 1):
+            if rect.contains(cell):
+                return GROUND_SOLID
+            if rect.colliderect(cell):
+                state = GROUND_MIXED
+        return state
+
+    def grid_cell_rect(self, tilex, tiley):
+        """The area of a grid cell on the screen, or where it would be if it's not visible."""
+        return pygame.Rect((tilex - (FULL_TILES_HOR - TILES_HOR)) * TILE_DIM,
+                           (tiley - (FULL_TILES_VER - TILES_VER)) * TILE_DIM,
+                           TILE_DIM, TILE_DIM)
+
+    def forget_ground_cells(self, tilex, tiley):
+        """
+        Drop the cached ground check states around a cell that was edited.
+        The neighbours go too, since tiles may be off their cell by a pixel.
+        """
+        for x in range(max(tilex - 1, 0), min(tilex + 2, FULL_TILES_HOR)):
+            for y in range(max(tiley - 1, 0), min(tiley + 2, FULL_TILES_VER)):
+                self.ground_cells[x][y] = GROUND_UNKNOWN
+        return
 
     #This functions tests (approximately) if a rect collides with another and from which direction.
     #It's one of the most performance-heavy functions in the game, and thus should be optimized.
@@ -264,51 +621,39 @@ class Level:
         rcopy.height += 1
         rcopy.width += 1
 
-        for t in self.active_tiles:
-            if not t.is_aligned():
-                # Sometimes collisions were misdetected just after the level
-                # was flipped, so this is an extra check to avoid that.
-                # Should look into the order things are done when
-                # flipping to fix the problem properly
-                continue
-
-            overlap = t.rect.clip(rcopy)
+        for tilex, tiley, tile_rect in self.tiles_in_area(rcopy.left, rcopy.top, rcopy.right, rcopy.bottom):
+            overlap = tile_rect.clip(rcopy)
             if not overlap:
               continue
 
-            tx, ty = t.tilex, t.tiley
-
-            edges = get_edges(t.rect)
-            right_edge = edges[RIGHT]
-            left_edge = edges[LEFT]
-            bottom_edge = edges[DOWN]
-            top_edge = edges[UP]
+            faces = self.exposed_faces[tilex][tiley]
 
-            # Edges are of the tile, so we invert to get the orientation as
-            # pertaining to the passed rect
-            col_top = rcopy.colliderect(bottom_edge) and not self.find_tile(tx, ty + 1)
-            col_bottom = rcopy.colliderect(top_edge) and not self.find_tile(tx, ty - 1)
-            col_left = rcopy.colliderect(right_edge) and not self.find_tile(tx + 1, ty)
-            col_right = rcopy.colliderect(left_edge) and not self.find_tile(tx - 1, ty)
+            # Faces are of the tile, so we invert to get the orientation as
+            # pertaining to the passed rect. An edge of the tile touches the
+            # rect when it lies within the rect's span on that axis.
+            col_top = (faces & (1 << DOWN)) and rcopy.top <= tile_rect.bottom < rcopy.bottom
+            col_bottom = (faces & (1 << UP)) and rcopy.top <= tile_rect.top < rcopy.bottom
+            col_left = (faces & (1 << RIGHT)) and rcopy.left <= tile_rect.right < rcopy.right
+            col_right = (faces & (1 << LEFT)) and rcopy.left <= tile_rect.left < rcopy.right
 
             col_hside = col_top or col_bottom
             col_vside = col_left or col_right
 
             can_hcol = not col_hside or not dy or overlap.width < overlap.height
             if dx > 0 and col_right and can_hcol:
-                collision[RIGHT] = t.rect.left
+                collision[RIGHT] = tile_rect.left
             elif dx < 0 and col_left and can_hcol:
-                collision[LEFT] = t.rect.right
+                collision[LEFT] = tile_rect.right
 
             can_vcol = not col_vside or not dx or overlap.width >= overlap.height
             if dy >= 0 and col_bottom and can_vcol:
-                collision[DOWN] = t.rect.top
-                if t.itemclass == "spikes":
+                collision[DOWN] = tile_rect.top
+                if self.tile_types[tilex][tiley] == SPIKES_CODE:
                     collision[DAMAGE] = 5
                 else:
                     collision[DAMAGE] = 0
             elif dy < 0 and col_top and can_vcol:
-                collision[UP] = t.rect.bottom
+                collision[UP] = tile_rect.bottom
 
         return collision
 
@@ -332,19 +677,19 @@ class Level:
             change.coords = (change.coords[0] + FULL_TILES_HOR - TILES_HOR,
                              change.coords[1] + FULL_TILES_VER - TILES_VER)
             self.add_tile(change.tile_change, change.coords)
-            self.reset_active_tiles()
 
     def remove_tile(self, coords):
         """
         Remove a tile from the level with coordinates relative to the corner of
         the area currently visible.
         """
-        for t in self.active_tiles:
-            if t.rect.collidepoint(coords[0] * TILE_DIM + TILE_DIM / 2,
-                                   coords[1]*TILE_DIM + TILE_DIM / 2):
-                self.active_tiles.remove(t)
-                self.tiles.remove(t)
-                self.edited = True
+        tilex = coords[0] + FULL_TILES_HOR - TILES_HOR
+        tiley = coords[1] + FULL_TILES_VER - TILES_VER
+        if self.find_tile(tilex, tiley):
+            self.tile_types[tilex][tiley] = 0
+            self.update_exposed_faces(tilex, tiley)
+            self.forget_ground_cells(tilex, tiley)
+            self.forget_image_cell(tilex, tiley)
 
 
     def add_tile(self, tile_type, coords):
@@ -352,18 +697,13 @@ class Level:
         Add a tile to the level with absolute coordinates in the current
         rotation state.
         """
-        new_tile = None
-        if tile_type == "W":
-            new_tile = Tile(self.screen, coords[0], coords[1], self.set)
-        elif tile_type == "B":
-            new_tile = Tile(self.screen, coords[0], coords[1], self.set, "bars")
-        elif tile_type == "S":
-            new_tile = Spikes(self.screen, coords[0], coords[1], self.set)
-        if new_tile != None:
-            self.tiles.append(new_tile)
-        self.edited = True
+        if tile_type in "WBS":
+            self.tile_types[coords[0]][coords[1]] = ord(tile_type)
+            self.update_exposed_faces(coords[0], coords[1])
+            self.forget_ground_cells(coords[0], coords[1])
+            self.forget_image_cell(coords[0], coords[1])
 
     def find_tile(self, tilex, tiley):
-        for t in self.tiles:
-            if t.tilex == tilex and t.tiley == tiley:
-                return t
+        if 0 <= tilex < FULL_TILES_HOR and 0 <= tiley < FULL_TILES_VER:
+            return self.tile_types[tilex][tiley]
+        return 0
@@ -0,0 +1,229 @@
+"""
+Compiled levels. A level file is parsed once into a LevelData: the tile
+grid as bytes, the table of objects to spawn and the scripted events split
+to tokens. Building a Level from it doesn't parse anything.
+
+Compiled levels are saved under the config directory, so later launches
+read each level with a single read instead of parsing the level file (and
+the TMX map it may use). A saved level is recompiled when any of its source
+files changes. Compiled levels are also kept in memory, so playing a level
+again doesn't touch the disk at all.
+
+The saved format is a packed header (magic, grid width and height), the
+grid as one byte per cell (the tile type code, or 0 for an empty cell) and
+the rest of the level as JSON.
+
+read_level_data leaves the compiled levels in memory alone, so the next
+level can be read on a worker thread while the current one is played and
+handed over with add_level_data.
+"""
+
+import os
+import json
+import struct
+
+import pytmx
+
+from .locals import *
+from .data import levelpath, filepath, load, getmtime
+from .util import get_config_path
+from .log import log_message, error_message
+from .scripted_event import tokenize_element
+
+
+LEVEL_MAGIC = b"WWL1"
+HEADER_FORMAT = "<4sBB"
+HEADER_SIZE = struct.calcsize(HEADER_FORMAT)
+LEVEL_CACHE_VERSION = 1
+
+compiled_levels = {}
+
+
+class UnknownTileException(Exception):
+    pass
+
+
+def get_tile_type(path):
+    base = os.path.basename(path)
+    for keyword in TILE_TYPE_MAP:
+        if keyword in base:
+            return TILE_TYPE_MAP[keyword]
+    raise UnknownTileException(path)
+
+
+def level_cache_path(level_name):
+    path_name = os.path.join(get_config_path(), "levels")
+    if not os.path.exists(path_name):
+        os.mkdir(path_name)
+    return os.path.join(path_name, level_name + ".level")
+
+
+def get_level_data(level_name):
+    """
+    Return the compiled level, from memory if it has been loaded before,
+    from the saved compiled level if it's up to date, or else by compiling
+    the level file.
+    """
+    if level_name not in compiled_levels:
+        compiled_levels[level_name] = read_level_data(level_name)
+    return compiled_levels[level_name]
+
+
+def read_level_data(level_name):
+    """
+    Load the saved compiled level if it's up to date, or else compile the
+    level file, without keeping it in memory.
+    """
+    data = LevelData.load(level_name)
+    if data == None:
+        data = compile_level(level_name)
+        data.save()
+    return data
+
+
+def add_level_data(data):
+    """Keep a compiled level read elsewhere in memory, unless it's there already."""
+    if data.level_name not in compiled_levels:
+        compiled_levels[data.level_name] = data
+
+
+def compile_level(level_name):
+    """Parse a level file into a LevelData."""
+    data = LevelData(level_name)
+    path = levelpath(level_name)
+    data.sources[path] = getmtime(path)
+    conffile = load(path, "r")
+
+    tiley = 0
+    values = []
+
+    trigger = False
+    current_event = None
+
+    parse_tiles = False
+
+    for line in conffile:
+
+        if parse_tiles:
+            if tiley < FULL_TILES_VER:
+                tilex = 0
+                while tilex < FULL_TILES_VER:
+                    if (line[tilex] == "W") or (line[tilex] == "B") or (line[tilex] == "S"):
+                        data.set_tile(line[tilex], (tilex, tiley))
+                    tilex += 1
+                tiley += 1
+                continue
+            else:
+                parse_tiles = False
+                continue
+
+        elif line.strip() != "":
+                values = line.split()
+
+                #Parsing special commands
+
+                if trigger:
+                    if values[0] == "end" and values[1] == "trigger":
+                        trigger = False
+                    else:
+                        current_event[2].append(tokenize_element(line))
+                    continue
+
+                elif values[0] == "trigger":
+                    trigger = True
+                    current_event = [values[1], int(values[2]), []]
+                    data.events.append(current_event)
+                    continue
+
+                elif values[0] == "set":
+                    # Original tileset declaration
+                    data.set = values[1]
+                    continue
+
+                elif values[0] == "tiles":
+                    # Original tilemap header
+                    data.tile_set = data.set
+                    if len(values) == 1:
+                        parse_tiles = True
+                        continue
+
+                    # Parse a TMX
+                    tmx_path = filepath(line.split(None, 1)[1].strip())
+                    data.sources[tmx_path] = getmtime(tmx_path)
+                    tmx = pytmx.pytmx.TiledMap(tmx_path)
+                    for x, y, image in tmx.layers[0].tiles():
+                        data.set_tile(get_tile_type(image[0]), (x, y))
+                    data.set = tmx.tilesets[0].name
+                    continue
+
+                #Objects are spawned with the tileset declared before them
+                data.objects.append([values, data.set])
+
+    conffile.close()
+    log_message("Compiled level " + level_name)
+    return data
+
+
+class LevelData:
+    def __init__(self, level_name):
+        self.level_name = level_name
+        #The tileset at the end of the level file, and the one the tiles use
+        self.set = "brown"
+        self.tile_set = "brown"
+        self.tiles = bytearray(FULL_TILES_HOR * FULL_TILES_VER)
+        #Lists of the values of the object's line and the tileset
+        self.objects = []
+        #Lists of the trigger type, the times and the tokens of each element
+        self.events = []
+        #Source files and their modification times
+        self.sources = {}
+
+    def set_tile(self, tile_type, coords):
+        self.tiles[coords[1] * FULL_TILES_HOR + coords[0]] = ord(tile_type)
+
+    def get_tile(self, tilex, tiley):
+        """The type code of the tile in a cell, or None if it's empty."""
+        code = self.tiles[tiley * FULL_TILES_HOR + tilex]
+        if code == 0:
+            return None
+        return chr(code)
+
+    @staticmethod
+    def load(level_name):
+        """Load the saved compiled level, if it's up to date. Returns None if not."""
+        try:
+            cache_file = open(level_cache_path(level_name), "rb")
+            cache = cache_file.read()
+            cache_file.close()
+            magic, width, height = struct.unpack(HEADER_FORMAT, cache[:HEADER_SIZE])
+            if magic != LEVEL_MAGIC or (width, height) != (FULL_TILES_HOR, FULL_TILES_VER):
+                return None
+            grid_end = HEADER_SIZE + width * height
+            info = json.loads(cache[grid_end:].decode("utf_8"))
+            if info["version"] != LEVEL_CACHE_VERSION:
+                return None
+            for path, mtime in info["sources"].items():
+                if getmtime(path) != mtime:
+                    return None
+        except Exception:
+            return None
+        data = LevelData(level_name)
+        data.tiles = bytearray(cache[HEADER_SIZE:grid_end])
+        data.set = info["set"]
+        data.tile_set = info["tile_set"]
+        data.objects = info["objects"]
+        data.events = info["events"]
+        data.sources = info["sources"]
+        return data
+
+    def save(self):
+        info = {"version": LEVEL_CACHE_VERSION, "sources": self.sources, "set": self.set,
+                "tile_set": self.tile_set, "objects": self.objects, "events": self.events}
+        try:
+            cache_file = open(level_cache_path(self.level_name), "wb")
+            cache_file.write(struct.pack(HEADER_FORMAT, LEVEL_MAGIC, FULL_TILES_HOR, FULL_TILES_VER))
+            cache_file.write(bytes(self.tiles))
+            cache_file.write(json.dumps(info).encode("utf_8"))
+            cache_file.close()
+        except Exception:
+            error_message("Couldn't save the compiled level " + self.level_name)
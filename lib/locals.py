@@ -27,12 +27,25 @@ PLAY_AREA_CENTER_Y = (-FULL_TILES_VER / 2 + TILES_VER) * TILE_DIM
 GRAVITY = MULT(1.0)
 GRAVITY_PARTICLE = MULT(0.5)
 
+#The size of the cells of the spatial hash used to find objects by area
+SPATIAL_HASH_CELL = TILE_DIM * 2
+
+#The most particles alive at once, and the part of them recycled at a time when full
+MAX_PARTICLES = 512
+PARTICLE_RECYCLE_FRACTION = 8
+
 PLAYER_JUMP_ACC = GRAVITY * 10.0
 
 PLAYER_AIR_JUMP = GRAVITY * 0.55
 
 FPS = 24
 
+#Display framerates that divide evenly into FPS, and how many frames in a row
+#may go undrawn when the game falls behind. Frames are drawn after the game
+#logic has run, so the display can't go faster than FPS.
+RENDER_FRAMERATES = (FPS, FPS // 2, FPS // 3, FPS // 4)
+MAX_FRAME_SKIP = 5
+
 #The time used flipping the level, in frames, and time from lever activation to the flipping, also in frames.
 FLIP_FRAMES = 30
 FLIP_DELAY = 15
@@ -45,6 +58,9 @@ PLAYER_ACC_AIR_MULTIPLIER = 0.18
 
 PLAYER_LIFE = 36 #Hit points
 
+#Opacity of the ghost replaying the last finished run of a level
+GHOST_ALPHA = 100
+
 #Spikes offset for rect placement - the spikes are smaller than the rest of tiles:
 SPIKES_VER_OFFSET = MULT(4)
 
@@ -54,6 +70,7 @@ SPIDER_FIRE_DELAY = 30
 SPIDER_TOO_WIDE = MULT(7)
 SPIDER_PROJECTILE_SPEED = MULT(5.0)
 SPIDER_DAMAGE = 5
+PROJECTILE_SPARKS = 4
 
 BLOB_JUMP_ACC = PLAYER_JUMP_ACC * 1.05
 BLOB_AIR_JUMP = GRAVITY * 0.5
@@ -75,12 +92,16 @@ ANALOG = 7
 CLOCKWISE = 1
 COUNTER_CLOCKWISE = -1
 
+#Bitmask of all the exposed faces of a tile, one bit per direction index above
+ALL_FACES = (1 << RIGHT) | (1 << LEFT) | (1 << DOWN) | (1 << UP)
+
 #Colors
 COLOR_DUST = {}
 COLOR_DUST["brown"] = (220, 200, 170)
 COLOR_DUST["green"] = (190, 185, 175)
 COLOR_DUST["grey"] = (190, 190, 185)
 COLOR_BLOOD = (200, 40, 10)
+COLOR_SPARK = (255, 240, 160)
 COLOR_GUI_DARK = (120, 120, 120)
 COLOR_GUI = (230, 230, 230)
 COLOR_GUI_HILIGHT = (255, 255, 255)
@@ -109,6 +130,7 @@ END_NEXT_LEVEL = 3
 END_QUIT = 4
 END_HARD_QUIT = 5
 END_MENU = 6
+END_RESTART = 7
 
 TOTAL_LEVELS = 7
 
@@ -20,6 +20,7 @@ from .log import error_message
 from .mainmenu import Mainmenu
 from .world import World
 from .sound import play_sound
+from .replay import ReplayReader
 
 
 def main():
@@ -27,14 +28,20 @@ def main():
     
     parse_config()
     variables["devmode"] = False
+    variables["ghost"] = False
+    variables["render_fps"] = FPS
     
     level_name = None
+    replay_file = None
     world_index = 0
     world = World(world_index)
     user_supplied_level = False
     
     if len(sys.argv) > 1:
         getlevel = False
+        getreplay = False
+        getfps = False
+        buildpack = False
         badarg = False
         for arg in sys.argv:
             if getlevel:
@@ -43,20 +50,41 @@ def main():
                 end_trigger = END_NEXT_LEVEL
                 menu_choice = MENU_QUIT
                 getlevel = False
+            elif getreplay:
+                replay_file = arg
+                getreplay = False
+            elif getfps:
+                if arg.isdigit() and int(arg) in RENDER_FRAMERATES:
+                    variables["render_fps"] = int(arg)
+                else:
+                    error_message("The draw rate has to be one of %s, not %r"
+                                  % (", ".join(str(fps) for fps in RENDER_FRAMERATES), arg))
+                getfps = False
             elif arg == "-l":
                 getlevel = True
+            elif arg == "-replay":
+                getreplay = True
+            elif arg == "-drawfps":
+                getfps = True
+            elif arg == "-ghost":
+                variables["ghost"] = True
             elif arg == "-dev":
                 variables["devmode"] = True
                 variables["verbose"] = True
             elif arg == "-v":
                 variables["verbose"] = True
+            elif arg == "-pack":
+                buildpack = True
             else:
                 badarg = arg
         
         if badarg:
             error_message('Unrecognized command line parameter: %r' % badarg)
-        if getlevel:
+        if getlevel or getreplay or getfps:
             error_message("Incorrect command line parameters")
+        if buildpack:
+            data.make_pack()
+            return
 
     #Initializing pygame and screen
 
@@ -92,6 +120,13 @@ def main():
 
     bgscreen = None
 
+    if replay_file != None:
+        # Watch the replay and quit
+        replay_stream = open(replay_file, "rb")
+        game.run(screen, None, 0, score, joystick, ReplayReader(replay_stream))
+        replay_stream.close()
+        done = True
+
     #Menu and level changing loop, actual game code is in game.py:
 
     while not done:
@@ -102,7 +137,8 @@ def main():
                     user_supplied_level = False
                     end_trigger = END_WIN
             else:
-                end_trigger = game.run(screen, level_name, world.level_index, score, joystick)
+                end_trigger = game.run(screen, level_name, world.level_index, score, joystick,
+                                       next_level=world.peek_level())
                 if end_trigger == END_NEXT_LEVEL:
                     if world.is_next_level():
                         level_name = world.get_level()
@@ -167,7 +203,7 @@ def main():
 
 
 def display_bg(key, screen):
-    bg_image = pygame.image.load(data.picpath("bg", key))
+    bg_image = pygame.image.load(data.load(data.picpath("bg", key)), data.picpath("bg", key))
     rect = bg_image.get_rect()
     screen.blit(bg_image, rect)
     return
@@ -0,0 +1,74 @@
+"""
+The manifest of the pictures and animation files in the data directory.
+It is made with a single scan of the pictures directory the first time
+it's needed, and resolves asset names, fallbacks included, to the files
+that exist. Loaders ask it instead of trying to open files and catching
+the failures.
+"""
+
+import os
+
+from .data import filepath, animpath, listdir, getmtime
+
+#File names in the pictures directory and their modification times
+pictures = None
+
+#The tileset whose animations and frames objects fall back to
+FALLBACK_SET = "brown"
+
+
+def get_pictures():
+    global pictures
+    if pictures == None:
+        pictures = {}
+        for name in listdir("pictures"):
+            pictures[name] = getmtime(filepath(os.path.join("pictures", name)))
+    return pictures
+
+
+def anim_file(object, anim_name):
+    """
+    The animation file of an object, or the fallback tileset's one, or else
+    the default single frame animation.
+    """
+    for owner in (object, FALLBACK_SET):
+        if owner + "_" + anim_name + ".txt" in get_pictures():
+            return animpath(owner, anim_name)
+    return animpath("default", "static")
+
+
+def frame_owner(object, anim_name, frameno):
+    """
+    The object whose frame files have a frame: the object itself or the
+    fallback tileset. None if neither has it.
+    """
+    for owner in (object, FALLBACK_SET):
+        if owner + "_" + anim_name + "_" + str(frameno) + ".png" in get_pictures():
+            return owner
+    return None
+
+
+def has_animation(object, anim_name):
+    """Whether an animation exists for an object, as its own or as a fallback."""
+    for owner in (object, FALLBACK_SET):
+        if owner + "_" + anim_name + ".txt" in get_pictures():
+            return True
+    return frame_owner(object, anim_name, 0) != None
+
+
+def frame_files(object):
+    """
+    Return a dict of the frame files of an object, keyed by animation and
+    frame number ("walking_0") and holding the modification time of each
+    file.
+    """
+    prefix = object + "_"
+    sources = {}
+    for name, mtime in get_pictures().items():
+        if not name.startswith(prefix) or not name.endswith(".png"):
+            continue
+        key = name[len(prefix):-len(".png")]
+        if not key.rsplit("_", 1)[-1].isdigit():
+            continue
+        sources[key] = mtime
+    return sources
@@ -89,7 +89,7 @@ class Menu:
       else:
         menu_offset = -(MENU_MAX_VISIBLE - 5) * 10
 
-      menu_bg = pygame.image.load(data.picpath("menu", "bg")).convert_alpha()
+      menu_bg = pygame.image.load(data.load(data.picpath("menu", "bg")), data.picpath("menu", "bg")).convert_alpha()
       rect = menu_bg.get_rect()
       rect.centerx = SCREEN_WIDTH / 2
       rect.top = GUI_MENU_TOP
@@ -169,10 +169,10 @@ class DynamicObject(VisibleObject):
       return self.orientation
 
   def render(self, surface = None, center = None, static_render = False):
-    VisibleObject.render(self, surface, center, static_render)
+    drawn = VisibleObject.render(self, surface, center, static_render)
     if variables["devmode"] and not self.flipping:
-      VisibleObject.render(self, surface, (self.initial_x, self.initial_y), static_render, 100)
-    return
+      drawn = drawn.union(VisibleObject.render(self, surface, (self.initial_x, self.initial_y), static_render, 100))
+    return drawn
   
   def take_damage(self, amount, x=None, y=None):
     """Make the object take the specified amount of damage.
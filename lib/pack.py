@@ -0,0 +1,108 @@
+"""
+Data packs. A pack holds all the files of the data directory in a single
+archive, so the game doesn't have to open hundreds of small files.
+
+A pack starts with the magic and the amount of files, followed by the
+index: for each file, sorted by name, the length of the name, the offset
+and the size of its contents, then the name itself as UTF-8. The names
+are relative to the data directory and use "/" as the separator. The
+contents of the files follow the index.
+
+Packs are memory mapped, and the contents of a file are copied out of the
+mapping when it is read.
+"""
+
+import os
+import mmap
+import struct
+import bisect
+
+from .log import log_message
+
+
+PACK_MAGIC = b"WWP1"
+HEADER_FORMAT = "<4sI"
+HEADER_SIZE = struct.calcsize(HEADER_FORMAT)
+ENTRY_FORMAT = "<HQQ"
+ENTRY_SIZE = struct.calcsize(ENTRY_FORMAT)
+
+#Files in the data directory that aren't worth packing
+SKIPPED_FILES = ("Thumbs.db",)
+
+
+def pack_name(path, root):
+    """The name of a file in a pack, from its path under the packed directory."""
+    return os.path.relpath(path, root).replace(os.sep, "/")
+
+
+class Pack:
+    def __init__(self, path):
+        self.file = open(path, "rb")
+        self.mtime = os.path.getmtime(path)
+        self.map = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, count = struct.unpack(HEADER_FORMAT, self.map[:HEADER_SIZE])
+        if magic != PACK_MAGIC:
+            raise ValueError("Not a data pack")
+
+        self.entries = {}
+        self.names = []
+        position = HEADER_SIZE
+        for i in range(count):
+            name_length, offset, size = struct.unpack(ENTRY_FORMAT, self.map[position:position + ENTRY_SIZE])
+            position += ENTRY_SIZE
+            name = self.map[position:position + name_length].decode("utf_8")
+            position += name_length
+            self.entries[name] = (offset, size)
+            self.names.append(name)
+
+    def read(self, name):
+        """A copy of the contents of a file as bytes, or None if it's not in the pack."""
+        if name not in self.entries:
+            return None
+        offset, size = self.entries[name]
+        return self.map[offset:offset + size]
+
+    def list(self, directory):
+        """The names of the files directly in a directory of the pack."""
+        prefix = directory.rstrip("/") + "/"
+        found = []
+        for name in self.names[bisect.bisect_left(self.names, prefix):]:
+            if not name.startswith(prefix):
+                break
+            if "/" not in name[len(prefix):]:
+                found.append(name[len(prefix):])
+        return found
+
+
+def build_pack(root, path):
+    """Pack all the files under the root directory into a pack file."""
+    files = []
+    for directory, subdirectories, filenames in os.walk(root):
+        for filename in filenames:
+            if filename not in SKIPPED_FILES:
+                full_path = os.path.join(directory, filename)
+                files.append((pack_name(full_path, root), full_path))
+    files.sort()
+
+    #Python 2 walks the directory with byte string names
+    names = [name if isinstance(name, bytes) else name.encode("utf_8") for name, full_path in files]
+    offset = HEADER_SIZE + sum(ENTRY_SIZE + len(name) for name in names)
+    sizes = [os.path.getsize(full_path) for name, full_path in files]
+
+    #Written next to the pack and moved over it, as the old pack may be mapped
+    pack_file = open(path + ".tmp", "wb")
+    pack_file.write(struct.pack(HEADER_FORMAT, PACK_MAGIC, len(files)))
+    for name, size in zip(names, sizes):
+        pack_file.write(struct.pack(ENTRY_FORMAT, len(name), offset, size))
+        pack_file.write(name)
+        offset += size
+    for name, full_path in files:
+        source = open(full_path, "rb")
+        pack_file.write(source.read())
+        source.close()
+    pack_file.close()
+    #Windows can't rename over an existing file
+    if os.name == "nt" and os.path.exists(path):
+        os.remove(path)
+    os.rename(path + ".tmp", path)
+    log_message("Packed %d files into %s" % (len(files), path))
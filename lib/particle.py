@@ -4,6 +4,7 @@ import pygame
 import os
 import random
 from math import *
+from array import array
 
 from pygame.locals import *
 
@@ -11,7 +12,11 @@ from locals import *
 
 import data
 
+STAMP_COLORKEY = (255, 0, 255)
+
 class Particle:
+  """A particle to be spawned. The particles are simulated and drawn by
+  a ParticleSystem, which copies the values of this one when it is added."""
   def __init__(self, screen, life = 30, x = None, y = None, dx = None, dy = None, random_move = 0, color = COLOR_DUST, radius = 3, gravity = False):
     self.screen = screen
     self.init_life = life
@@ -38,24 +43,153 @@ class Particle:
     return
 
 
-  def update(self):
-    self.radius = (float(self.life) / float(self.init_life)) * self.init_radius
-    self.x += self.dx
-    self.y += self.dy
-    if self.gravity:
-      self.dy += GRAVITY_PARTICLE
-    self.dx += self.random_move * random.uniform(-0.5, 0.5)
-    self.dy += self.random_move * random.uniform(-0.5, 0.5)
-    self.life -= 1
-    if self.life < 0:
-      self.dead = True
+class ParticleSystem:
+  """The live particles of a level. Instead of an object per particle, the
+  values of each particle are kept in flat arrays, indexed by the order the
+  particles were spawned in, so the oldest particle is always first. Dead
+  particles are compacted away while updating.
+
+  There can be at most capacity particles. When the system is full, the
+  oldest ones are recycled to make room for new ones."""
+
+  def __init__(self, screen, capacity = MAX_PARTICLES):
+    self.screen = screen
+    self.capacity = capacity
+    self.count = 0
+    self.x = array("d", [0.0]) * capacity
+    self.y = array("d", [0.0]) * capacity
+    self.dx = array("d", [0.0]) * capacity
+    self.dy = array("d", [0.0]) * capacity
+    self.life = array("d", [0.0]) * capacity
+    self.init_life = array("d", [0.0]) * capacity
+    self.radius = array("d", [0.0]) * capacity
+    self.init_radius = array("d", [0.0]) * capacity
+    self.random_move = array("d", [0.0]) * capacity
+    self.gravity = array("B", [0]) * capacity
+    self.color = array("H", [0]) * capacity
+    self.fields = (self.x, self.y, self.dx, self.dy, self.life, self.init_life, self.radius,
+                   self.init_radius, self.random_move, self.gravity, self.color)
+    #Colors are stored as indices into the palette
+    self.palette = []
+    self.palette_index = {}
+    #Pre-drawn circles by color index and radius
+    self.stamps = {}
+    return
+
+  def __len__(self):
+    return self.count
+
+  def emit(self, life = 30, x = None, y = None, dx = None, dy = None, random_move = 0, color = COLOR_DUST, radius = 3, gravity = False):
+    """Spawn a particle. Takes the same arguments as Particle."""
+    if self.count == self.capacity:
+      self.recycle(max(1, self.capacity // PARTICLE_RECYCLE_FRACTION))
+    if color not in self.palette_index:
+      self.palette_index[color] = len(self.palette)
+      self.palette.append(color)
+    if (x == None):
+      x = SCREEN_WIDTH / 2
+    if (y == None):
+      y = SCREEN_HEIGHT / 2
+    i = self.count
+    self.x[i] = x
+    self.y[i] = y
+    self.dx[i] = dx or 0.0
+    self.dy[i] = dy or 0.0
+    self.life[i] = life
+    self.init_life[i] = life
+    self.radius[i] = radius
+    self.init_radius[i] = radius
+    self.random_move[i] = random_move
+    self.gravity[i] = bool(gravity)
+    self.color[i] = self.palette_index[color]
+    self.count += 1
+    return
+
+  def add(self, particle):
+    self.emit(particle.init_life, particle.x, particle.y, particle.dx, particle.dy, particle.random_move,
+              particle.color, particle.init_radius, particle.gravity)
     return
 
-  def render(self, drawsurface = None):
-    pygame.draw.circle(self.screen, self.color, (int(self.x), int(self.y)), int(self.radius))
+  def extend(self, particles):
+    for p in particles:
+      self.add(p)
     return
 
+  def recycle(self, amount):
+    """Remove the oldest particles. Done a chunk at a time, so a burst of
+    spawns into a full system only moves the arrays around once in a while."""
+    amount = min(amount, self.count)
+    remaining = self.count - amount
+    for field in self.fields:
+      field[0:remaining] = field[amount:self.count]
+    self.count = remaining
+    return
+
+  def clear(self):
+    self.count = 0
+    return
+
+  def update(self):
+    """Move and age all the particles, dropping the dead ones."""
+    x, y, dx, dy = self.x, self.y, self.dx, self.dy
+    life, init_life, radius, init_radius = self.life, self.init_life, self.radius, self.init_radius
+    random_move, gravity, color = self.random_move, self.gravity, self.color
+    rand = random.random
+    alive = 0
+    for i in range(self.count):
+      if life[i] < 1:
+        continue
+      move = random_move[i]
+      x[alive] = x[i] + dx[i]
+      y[alive] = y[i] + dy[i]
+      ddy = dy[i] + move * (rand() - 0.5)
+      if gravity[i]:
+        ddy += GRAVITY_PARTICLE
+      dx[alive] = dx[i] + move * (rand() - 0.5)
+      dy[alive] = ddy
+      radius[alive] = life[i] / init_life[i] * init_radius[i]
+      life[alive] = life[i] - 1
+      if alive != i:
+        init_life[alive] = init_life[i]
+        init_radius[alive] = init_radius[i]
+        random_move[alive] = move
+        gravity[alive] = gravity[i]
+        color[alive] = color[i]
+      alive += 1
+    self.count = alive
+    return
+
+  def render(self):
+    """Draw all the particles. Each particle is a blit of a pre-drawn circle
+    of its color and radius, done in one batch. Returns a list of the drawn
+    rects."""
+    stamps = self.stamps
+    x, y, radius, color = self.x, self.y, self.radius, self.color
+    blit_list = []
+    for i in range(self.count):
+      r = int(radius[i])
+      key = (color[i], r)
+      if key not in stamps:
+        stamps[key] = self.make_stamp(self.palette[color[i]], r)
+      blit_list.append((stamps[key], (int(x[i]) - r, int(y[i]) - r)))
+    if hasattr(self.screen, "blits"):
+      return self.screen.blits(blit_list)
+    #Older pygame versions don't have blits
+    blit = self.screen.blit
+    return [blit(stamp, position) for stamp, position in blit_list]
+
+  def make_stamp(self, color, radius):
+    size = radius * 2 + 1
+    colorkey = STAMP_COLORKEY
+    if color == colorkey:
+      colorkey = (0, 0, 0)
+    stamp = pygame.Surface((size, size)).convert()
+    stamp.fill(colorkey)
+    pygame.draw.circle(stamp, color, (radius, radius), radius)
+    stamp.set_colorkey(colorkey, RLEACCEL)
+    return stamp
+
   def flip(self):
-    self.life = -1
-    self.dead = True
+    """The particles don't survive the level flipping."""
+    self.clear()
     return
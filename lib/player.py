@@ -27,7 +27,7 @@ class Player(DynamicObject):
     for anim in ('walking', 'arrow', 'dying', 'shouting', 'exit', 'gone'):
       self.animations[anim] = Animation(character, anim)
     
-    self.image = self.animations[self.current_animation].update_and_get_image()
+    self.update_image()
     self.rect = self.image.get_rect()
     self.itemclass = "player"
 
@@ -89,19 +89,27 @@ class Player(DynamicObject):
     DynamicObject.dec(self, direction)
     return
 
+  def animate(self, static_render = False):
+    #Off the top of the screen only the arrow is shown, and the rest of the animations wait
+    self.rect.centerx = int(self.x)
+    self.rect.centery = int(self.y)
+    if self.rect.bottom > 0:
+      DynamicObject.animate(self, static_render)
+
   def render(self, surface = None, topleft = None, static_render = False):
     self.rect.centerx = int(self.x)
     self.rect.centery = int(self.y)
     if self.rect.bottom > 0:
-      DynamicObject.render(self, surface, topleft, static_render)
+      drawn = DynamicObject.render(self, surface, topleft, static_render)
     else:
       self.arrowimage = self.animations["arrow"].update_and_get_image()
       self.arrowrect = self.arrowimage.get_rect()
       self.arrowrect.centerx = int(self.x)
       self.arrowrect.top = 5
-      self.screen.blit(self.arrowimage, self.arrowrect)
+      drawn = self.screen.blit(self.arrowimage, self.arrowrect)
     if self.umbrella_on:
       self.umbrella_on = False # This should be set again before next render by the jump function
+    return drawn
 
   def jump(self):
     if self.on_ground:
@@ -2,6 +2,7 @@
 
 import pygame
 import os
+import random
 
 from pygame.locals import *
 
@@ -10,8 +11,15 @@ from locals import *
 import data
 
 from object import DynamicObject
+from particle import Particle
 from sound import play_sound
-from animation import Animation
+from animation import Animation, get_clip
+
+def load_projectile_clips(set = "energy"):
+  """Load the animations of the projectiles of a set ahead of the first one
+  being fired, so firing doesn't read any files mid-game."""
+  get_clip(set, "flying")
+  get_clip(set, "dying")
 
 class Projectile(DynamicObject):
 
@@ -19,7 +27,7 @@ class Projectile(DynamicObject):
     DynamicObject.__init__(self, screen, x, y, -1, False, False)
     self.animations["default"] = Animation(set, "flying")
     self.animations["dying"] = Animation(set, "dying")
-    self.image = self.animations[self.current_animation].update_and_get_image()
+    self.update_image()
     self.rect = self.image.get_rect()
     self.dx = dx
     self.dy = dy
@@ -29,6 +37,7 @@ class Projectile(DynamicObject):
     return
 
   def update(self, level = None):
+    last_x, last_y = self.x, self.y
     DynamicObject.update(self, level)
 
     if self.dx == 0 and self.dy == 0 and self.saveddx != None: #Restores values saved on flipping
@@ -36,12 +45,31 @@ class Projectile(DynamicObject):
       self.dy = self.saveddy
       self.saveddx = None
 
-    if level.ground_check(self.x - 1, self.y - 1) or level.ground_check(self.x + 1, self.y + 1): #Simplified collision detection
+    if self.current_animation == "dying":
+      return
+
+    #Flipping carries the projectile around with the level instead of through
+    #it, so the sweep starts over from where the flip leaves it
+    if self.flipping or self.flip_finished:
+      return
+
+    #The whole way flown this frame is checked, so fast projectiles can't pass through walls
+    impact = level.sweep(last_x, last_y, self.x, self.y)
+    if impact != None:
+      self.x, self.y = impact
       self.die()
       self.dx = 0
       self.dy = 0
+      return self.sparks()
     return
 
+  def sparks(self):
+    """Returns a list of particles flying off the point of impact."""
+    sparks = []
+    for i in range(PROJECTILE_SPARKS):
+      sparks.append(Particle(self.screen, 6, self.x, self.y, random.uniform(-3, 3), random.uniform(-3, 3), 0.5, COLOR_SPARK, 2))
+    return sparks
+
   def flip(self, flip_direction = CLOCKWISE):
     if flip_direction == CLOCKWISE:
       self.saveddx = -self.dy
@@ -0,0 +1,115 @@
+"""
+Recording and playback of the player's inputs, for replays and ghosts.
+
+A replay stores the level name, the random seed the level was played with,
+the player's life at the start and the inputs of every frame. The inputs are packed to a byte of flags
+(see INPUT_FLAGS) and run-length encoded: each record is the flags byte
+followed by the amount of frames they stayed the same, as an unsigned short.
+Records are read one at a time, so a replay can be played from a stream.
+"""
+
+import os
+import struct
+
+from .util import get_config_path
+
+
+REPLAY_MAGIC = b"WWR1"
+HEADER_FORMAT = "<4sIBB"
+RECORD_FORMAT = "<BH"
+RECORD_SIZE = struct.calcsize(RECORD_FORMAT)
+MAX_RUN = 0xFFFF
+
+#The inputs worth recording, in flag bit order. The analog stick value isn't
+#used by the game loop, so it's left out.
+INPUT_FLAGS = ("LEFT", "RIGHT", "UP", "JUMP", "DOWN", "SPECIAL", "PAUSE")
+
+
+def inputs_to_flags(inputs):
+    flags = 0
+    bit = 1
+    for key in INPUT_FLAGS:
+        if key in inputs:
+            flags |= bit
+        bit <<= 1
+    return flags
+
+
+def flags_to_inputs(flags):
+    inputs = {}
+    bit = 1
+    for key in INPUT_FLAGS:
+        if flags & bit:
+            inputs[key] = True
+        bit <<= 1
+    return inputs
+
+
+def replay_path(level_name):
+    """
+    The path the last finished run of a level is saved to, under the config
+    directory.
+    """
+    path_name = os.path.join(get_config_path(), "replays")
+    if not os.path.exists(path_name):
+        os.mkdir(path_name)
+    return os.path.join(path_name, level_name + ".replay")
+
+
+class ReplayRecorder:
+    """
+    Writes a replay to a binary stream one frame at a time. Nothing is
+    written until the inputs change, so recording costs next to nothing
+    per frame. Call close to write out the last record.
+    """
+    def __init__(self, stream, level_name, seed, life):
+        self.stream = stream
+        name = level_name.encode("utf_8")
+        self.stream.write(struct.pack(HEADER_FORMAT, REPLAY_MAGIC, seed, life, len(name)))
+        self.stream.write(name)
+        self.flags = None
+        self.run = 0
+
+    def add_frame(self, inputs):
+        flags = inputs_to_flags(inputs)
+        if flags == self.flags and self.run < MAX_RUN:
+            self.run += 1
+        else:
+            self.flush()
+            self.flags = flags
+            self.run = 1
+
+    def flush(self):
+        if self.run > 0:
+            self.stream.write(struct.pack(RECORD_FORMAT, self.flags, self.run))
+            self.run = 0
+
+    def close(self):
+        self.flush()
+        self.flags = None
+
+
+class ReplayReader:
+    """
+    Reads the header of a replay from a binary stream. Iterating over the
+    reader gives the inputs dict of each frame, reading records from the
+    stream as they are needed. Frames of the same record share one dict,
+    so don't modify them.
+    """
+    def __init__(self, stream):
+        self.stream = stream
+        header = stream.read(struct.calcsize(HEADER_FORMAT))
+        magic, self.seed, self.life, name_length = struct.unpack(HEADER_FORMAT, header)
+        if magic != REPLAY_MAGIC:
+            raise ValueError("Not a replay file")
+        self.level_name = stream.read(name_length).decode("utf_8")
+
+    def __iter__(self):
+        while True:
+            record = self.stream.read(RECORD_SIZE)
+            if len(record) < RECORD_SIZE:
+                return
+            flags, run = struct.unpack(RECORD_FORMAT, record)
+            inputs = flags_to_inputs(flags)
+            for i in range(run):
+                yield inputs
@@ -13,6 +13,18 @@ from log import log_message
 
 from variables import variables
 
+def tokenize_element(text):
+  """Split the line of a scripted event element to a list of tokens: the
+  element type followed by the dialogue text or the player command and its
+  value."""
+  values  = text.split(" ", 1)
+  etype = values[0].strip()
+  if etype == "dialogue":
+    return [etype, values[1].strip()]
+  elif etype == "player":
+    return [etype] + values[1].split()
+  return [etype]
+
 class Scripted_event_element:
   def __init__(self, event_type, text="", orientation=RIGHT, animation=""):
     self.event_type = event_type
@@ -31,17 +43,19 @@ class Scripted_event:
     self.times = times
   
   def add_element(self, text):
-    values  = text.split(" ", 1)
-    etype = values[0].strip()
+    self.add_tokens(tokenize_element(text))
+
+  def add_tokens(self, values):
+    """Add an element from the tokens of its line, as given by tokenize_element."""
+    etype = values[0]
     if etype == "dialogue":
-      element = Scripted_event_element(etype, values[1].strip())
+      element = Scripted_event_element(etype, values[1])
     elif etype == "player":
-      values = values[1].split()
-      if values[0] == "orientation":
-        self.last_dir = dir_from_str(values[1])
-        element = Scripted_event_element(etype, values[0], self.last_dir)
-      if values[0] == "animation":
-        element = Scripted_event_element(etype, values[0], self.last_dir, values[1])
+      if values[1] == "orientation":
+        self.last_dir = dir_from_str(values[2])
+        element = Scripted_event_element(etype, values[1], self.last_dir)
+      if values[1] == "animation":
+        element = Scripted_event_element(etype, values[1], self.last_dir, values[2])
     else:
       element = Scripted_event_element(etype)
     
@@ -0,0 +1,72 @@
+"""
+Snapshots of the state of a level. A snapshot records the attributes of
+the level and of everything it holds that changes while it's played: the
+objects, their animations, the scripted events and so on. Restoring it puts
+the same objects back in the state they were in, so there's nothing to
+load or build again.
+
+The lists, dicts, sets and rects in the recorded attributes are stored as
+frozen copies, and new ones are made from them on every restore, so a
+snapshot can be restored any amount of times. Anything else (images,
+frames, clips, tile kinds) is never changed by playing, so it is shared
+with the snapshot instead of copied.
+"""
+
+import pygame
+
+
+class Frozen:
+    """A frozen copy of a container or a rect, which thaws into a new one."""
+    __slots__ = ("kind", "contents")
+
+    def __init__(self, kind, contents):
+        self.kind = kind
+        self.contents = contents
+
+
+class Snapshot:
+    def __init__(self, root, state_types):
+        """
+        Record the state of the root object. Instances of the state types it
+        refers to, directly or through other containers and objects, are
+        recorded too.
+        """
+        self.root = root
+        self.state_types = state_types
+        #The recorded objects and their frozen attributes, by id
+        self.states = {}
+        self.freeze(root)
+
+    def freeze(self, value):
+        if isinstance(value, self.state_types):
+            if id(value) not in self.states:
+                self.states[id(value)] = None
+                self.states[id(value)] = (value, tuple((name, self.freeze(attribute))
+                                                       for name, attribute in value.__dict__.items()))
+            return value
+        if isinstance(value, (list, tuple, set)):
+            return Frozen(type(value), tuple(self.freeze(item) for item in value))
+        if isinstance(value, dict):
+            return Frozen(dict, tuple((key, self.freeze(item)) for key, item in value.items()))
+        if isinstance(value, bytearray):
+            return Frozen(bytearray, bytes(value))
+        if isinstance(value, pygame.Rect):
+            return Frozen(pygame.Rect, tuple(value))
+        return value
+
+    def thaw(self, value):
+        if not isinstance(value, Frozen):
+            return value
+        if value.kind == dict:
+            return dict((key, self.thaw(item)) for key, item in value.contents)
+        if value.kind in (list, tuple, set):
+            return value.kind(self.thaw(item) for item in value.contents)
+        return value.kind(value.contents)
+
+    def restore(self):
+        """Put every recorded object back in its recorded state and return the root."""
+        for o, attributes in self.states.values():
+            o.__dict__.clear()
+            for name, value in attributes:
+                o.__dict__[name] = self.thaw(value)
+        return self.root
@@ -31,7 +31,7 @@ def play_sound(sound_id, volume=1.0):
     if sound_id not in sounds:
         try:
             sound_path = data.filepath(os.path.join("sounds", sound_id + ".ogg"))
-            snd = sounds[sound_id] = pygame.mixer.Sound(sound_path)
+            snd = sounds[sound_id] = pygame.mixer.Sound(data.load(sound_path))
         except:
             error_message("No sound device available or sound file not found: " + sound_id + ".ogg")
             return
@@ -11,7 +11,7 @@ import data
 from object import DynamicObject
 from sound import play_sound
 from animation import Animation
-from projectile import Projectile
+from projectile import Projectile, load_projectile_clips
 
 from util import cycle_clockwise, cycle_counter_clockwise, get_direction, str_from_dir
 from sound import play_sound
@@ -23,13 +23,14 @@ class Spider(DynamicObject):
     DynamicObject.__init__(self, screen, x, y, 10, False, False)
     self.animations["default"] = Animation("spider", "standing")
     self.animations["walking"] = Animation("spider", "walking")
-    self.image = self.animations[self.current_animation].update_and_get_image()
+    self.update_image()
     self.rect = self.image.get_rect()
     self.itemclass = "spider"
 
     self.attached = attached
     self.move_target = STAY
     self.fire_delay = 0
+    load_projectile_clips("energy")
 
   def get_orientation(self):
     return self.attached
@@ -130,4 +131,4 @@ class Spider(DynamicObject):
       play_sound("fire")
       self.fire_delay = SPIDER_FIRE_DELAY
       fire_direction = get_direction(self.attached)
-      level.objects.append(Projectile(self.screen, self.x, self.y, fire_direction[0]*-SPIDER_PROJECTILE_SPEED, fire_direction[1]*-SPIDER_PROJECTILE_SPEED, SPIDER_DAMAGE, "energy"))
+      level.spawn(Projectile(self.screen, self.x, self.y, fire_direction[0]*-SPIDER_PROJECTILE_SPEED, fire_direction[1]*-SPIDER_PROJECTILE_SPEED, SPIDER_DAMAGE, "energy"))
@@ -1,3 +1,7 @@
+'''The tiles of a level are kept by Level as a grid of tile type codes
+("W", "B" or "S"). The tiles of the same type and tileset share a TileKind,
+which holds their image and where in its grid cell a tile lies.'''
+
 import pygame
 import os
 
@@ -7,58 +11,44 @@ from locals import *
 
 import data
 
-from visibleobject import VisibleObject
 from animation import Animation
 
-from log import log_message
-
-class Tile(VisibleObject):
-  def __init__(self, screen, tilex, tiley, set = "brown", tileclass = "wall"):
-    x = (tilex - (FULL_TILES_HOR - TILES_HOR) + 0.5) * TILE_DIM
-    y = (tiley - (FULL_TILES_VER - TILES_VER) + 0.5) * TILE_DIM
-    VisibleObject.__init__(self, screen, x, y)
-    self.animations["default"] = Animation(set, tileclass)
-    self.image = self.animations[self.current_animation].update_and_get_image()
-    self.rect = self.image.get_rect()
-    self.tilex = tilex
-    self.tiley = tiley
-    self.tileclass = tileclass
-    self.aligned = True
-    return
-
-  def update(self, level = None):
-    VisibleObject.update(self)
-    if not self.flipping:
-      self.realign()
-    return
-
-  def flip(self, flip_direction = CLOCKWISE):
-    VisibleObject.flip(self, flip_direction)
-    if flip_direction == CLOCKWISE:
-      tempx = self.tilex
-      self.tilex = FULL_TILES_VER - self.tiley - 1
-      self.tiley = tempx
-    else:
-      tempy = self.tiley
-      self.tiley = FULL_TILES_HOR - self.tilex - 1
-      self.tilex = tempy
-
-
-  def realign(self):
-    self.rect.centerx = self.x
-    self.rect.centery = self.y
-    self.x = round((float(self.rect.right)/float(TILE_DIM)), 0)*TILE_DIM - self.rect.width / 2
-    self.y = round((float(self.rect.bottom)/float(TILE_DIM)), 0)*TILE_DIM - self.rect.height / 2
-    if self.rect.height % 2 == 1:
-       self.y -= 1
-    if self.rect.width % 2 == 1:
-       self.x -= 1
-    self.rect.centerx = self.x
-    self.rect.centery = self.y
+TILE_CLASSES = {"W": "wall", "B": "bars", "S": "spikes"}
+
+tile_kinds = {}
+
+def get_tile_kind(set, tile_type):
+  """Return the TileKind of a tile type code in a tileset, loading it on first use."""
+  if (set, tile_type) not in tile_kinds:
+    tile_kinds[(set, tile_type)] = TileKind(set, tile_type)
+  return tile_kinds[(set, tile_type)]
+
+def align_rect(rect):
+  """Snap a tile's rect to the bottom right corner of the grid cell it is in.
+  Tiles smaller than a cell (spikes) lie in the corner."""
+  x = round((float(rect.right)/float(TILE_DIM)), 0)*TILE_DIM - rect.width / 2
+  y = round((float(rect.bottom)/float(TILE_DIM)), 0)*TILE_DIM - rect.height / 2
+  if rect.height % 2 == 1:
+     y -= 1
+  if rect.width % 2 == 1:
+     x -= 1
+  rect.centerx = x
+  rect.centery = y
+  return
+
+class TileKind:
+  def __init__(self, set, tile_type):
+    self.tile_type = tile_type
+    self.tileclass = TILE_CLASSES[tile_type]
+    self.image = Animation(set, self.tileclass).update_and_get_image()
+    #The rect of a tile in the cell at the screen's top left corner
+    self.cell_rect = self.image.get_rect()
+    self.cell_rect.centerx = TILE_DIM / 2
+    self.cell_rect.centery = TILE_DIM / 2
+    align_rect(self.cell_rect)
     return
 
-  def is_aligned(self):
-    aligned = self.rect.right % TILE_DIM == 0 and self.rect.bottom % TILE_DIM == 0
-    if not aligned:
-      log_message("tilepos " + str(self.rect.right) + " " + str(self.rect.bottom))
-    return aligned
\ No newline at end of file
+  def get_rect(self, tilex, tiley):
+    """The rect of a tile of this kind in a grid cell."""
+    return self.cell_rect.move((tilex - (FULL_TILES_HOR - TILES_HOR)) * TILE_DIM,
+                               (tiley - (FULL_TILES_VER - TILES_VER)) * TILE_DIM)
@@ -30,13 +30,13 @@ class Score:
 
 class Util:
     pygame.font.init()
-    smallfont = pygame.font.Font(data.filepath(os.path.join('misc', 'Vera.ttf')), FONT_SIZE)
+    smallfont = pygame.font.Font(data.load(os.path.join('misc', 'Vera.ttf')), FONT_SIZE)
     cached_text_images = {}
     cached_images = {}
-    cached_images['key_z'] = pygame.image.load(data.picpath('key', 'z'))
-    cached_images['key_p'] = pygame.image.load(data.picpath('key', 'p'))
-    cached_images['health_bar_fill'] = pygame.image.load(data.picpath('health_bar', 'fill'))
-    cached_images['health_bar_empty'] = pygame.image.load(data.picpath('health_bar', 'empty'))
+    cached_images['key_z'] = pygame.image.load(data.load(data.picpath('key', 'z')), data.picpath('key', 'z'))
+    cached_images['key_p'] = pygame.image.load(data.load(data.picpath('key', 'p')), data.picpath('key', 'p'))
+    cached_images['health_bar_fill'] = pygame.image.load(data.load(data.picpath('health_bar', 'fill')), data.picpath('health_bar', 'fill'))
+    cached_images['health_bar_empty'] = pygame.image.load(data.load(data.picpath('health_bar', 'empty')), data.picpath('health_bar', 'empty'))
     fade_state = FADE_STATE_BLACK
     blackscreen = pygame.Surface((SCREEN_WIDTH, SCREEN_HEIGHT))
 
@@ -203,32 +203,34 @@ def render_text_dialogue(screen, string, phase, key='z'):
     For fancy dialogue display.
     The phase value is the amount of characters shown.
     -1 phase means that the whole string is visible.
+    If screen is None, nothing is drawn but the phase advances as usual.
     """
     if phase == -1:
         phase = len(string)
 
-    rendered_string = string[0:phase]
-    string_image = render_text(rendered_string)
-    string_rect = string_image.get_rect()
-    string_rect.centerx = SCREEN_WIDTH / 2
-    string_rect.centery = SCREEN_HEIGHT / 2
+    if screen != None:
+        rendered_string = string[0:phase]
+        string_image = render_text(rendered_string)
+        string_rect = string_image.get_rect()
+        string_rect.centerx = SCREEN_WIDTH / 2
+        string_rect.centery = SCREEN_HEIGHT / 2
 
-    if key == 'p':
-        skip_image = Util.cached_images['key_p']
-    else:
-        skip_image = Util.cached_images['key_z']
+        if key == 'p':
+            skip_image = Util.cached_images['key_p']
+        else:
+            skip_image = Util.cached_images['key_z']
 
-    skip_rect = skip_image.get_rect()
-    skip_rect.centerx = SCREEN_WIDTH / 2
-    skip_rect.top = string_rect.bottom + 5
+        skip_rect = skip_image.get_rect()
+        skip_rect.centerx = SCREEN_WIDTH / 2
+        skip_rect.top = string_rect.bottom + 5
 
-    bg_rect = pygame.Rect(string_rect.left - 10, string_rect.top - 5, string_rect.width + 20, string_rect.height + skip_rect.height + 15)
-    bg_image = pygame.Surface((bg_rect.width, bg_rect.height))  
-    bg_image.set_alpha(FADE_STATE_HALF)
+        bg_rect = pygame.Rect(string_rect.left - 10, string_rect.top - 5, string_rect.width + 20, string_rect.height + skip_rect.height + 15)
+        bg_image = pygame.Surface((bg_rect.width, bg_rect.height))
+        bg_image.set_alpha(FADE_STATE_HALF)
 
-    screen.blit(bg_image, bg_rect)
-    screen.blit(string_image, string_rect)
-    screen.blit(skip_image, skip_rect)
+        screen.blit(bg_image, bg_rect)
+        screen.blit(string_image, string_rect)
+        screen.blit(skip_image, skip_rect)
 
     if phase < len(string):
         phase += 1
@@ -281,6 +283,7 @@ def fade_to_black(screen, fade_target):
     fade_target should be an integer (0-255)
     * 255 = FADE_STATE_BLACK : The display is all black
     * 0 = FADE_STATE_NONE : The display is not faded at all
+    If screen is None, the fade state advances without drawing anything.
     """
     if Util.fade_state > fade_target:
         Util.fade_state += int(255 / (FPS * FADE_IN))
@@ -290,7 +293,7 @@ def fade_to_black(screen, fade_target):
         Util.fade_state -= -int(255 / (FPS * FADE_OUT))
         if Util.fade_state > fade_target:
             Util.fade_state = fade_target
-    if Util.fade_state > FADE_STATE_NONE:
+    if Util.fade_state > FADE_STATE_NONE and screen != None:
         Util.blackscreen.set_alpha(Util.fade_state)
         screen.blit(Util.blackscreen, screen.get_rect())
     return (Util.fade_state == fade_target)
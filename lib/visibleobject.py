@@ -11,6 +11,18 @@ from .locals import *
 from .animation import Animation
 from .log import log_message
 
+def build_flip_rotations(frames):
+  """Return the cos and sin of the angle turned after each frame of a flip
+  lasting the given amount of frames, by flip direction."""
+  step = pi * 0.5 / (frames + 1)
+  rotations = {}
+  for direction in (CLOCKWISE, COUNTER_CLOCKWISE):
+    rotations[direction] = [(cos(i * step * direction), sin(i * step * direction)) for i in range(frames + 2)]
+  return rotations
+
+#Every flipping object turns by the same angles, so they're worked out once
+FLIP_ROTATIONS = build_flip_rotations(FLIP_FRAMES)
+
 class VisibleObject:
 
   def __init__(self, screen, x = None, y = None):
@@ -18,7 +30,7 @@ class VisibleObject:
     self.animations = {}
     self.animations["default"] = Animation("object", "idle")
     self.current_animation = "default"
-    self.image = self.animations[self.current_animation].update_and_get_image()
+    self.update_image()
     self.rect = self.image.get_rect()
     self.x = x
     self.y = y
@@ -29,7 +41,7 @@ class VisibleObject:
 
     self.flipping = False
     self.flipcounter = 0
-    self.flip_init_angle = 0
+    self.flip_offset = (0, 0)
     self.flip_finished = False
     self.flip_direction = CLOCKWISE #The object will move clockwise
 
@@ -51,16 +63,13 @@ class VisibleObject:
     if self.flipping:
 
       if self.flipcounter == 0:
-        rela_x = self.x - PLAY_AREA_CENTER_X
-        rela_y = self.y - PLAY_AREA_CENTER_Y
-        self.rad = sqrt(rela_x**2 + rela_y**2)
-        self.flip_init_angle = atan2(rela_y, rela_x)
+        self.flip_offset = (self.x - PLAY_AREA_CENTER_X, self.y - PLAY_AREA_CENTER_Y)
 
       self.flipcounter += 1
-      self.flip_angle = self.flipcounter * (pi * 0.5 / (FLIP_FRAMES + 1)) * self.flip_direction
-      self.angle = self.flip_angle + self.flip_init_angle
-      self.x = PLAY_AREA_CENTER_X + cos(self.angle) * self.rad
-      self.y = PLAY_AREA_CENTER_Y + sin(self.angle) * self.rad
+      cos_angle, sin_angle = FLIP_ROTATIONS[self.flip_direction][self.flipcounter]
+      rela_x, rela_y = self.flip_offset
+      self.x = PLAY_AREA_CENTER_X + cos_angle * rela_x - sin_angle * rela_y
+      self.y = PLAY_AREA_CENTER_Y + sin_angle * rela_x + cos_angle * rela_y
 
       if self.flipcounter > FLIP_FRAMES:
         self.flipcounter = 0
@@ -70,40 +79,41 @@ class VisibleObject:
         self.flip_finished = True
     return
 
-  def render(self, surface = None, center = None, static_render = False, alpha = 255):
-    """Render the object - also flips or rotates it visually according to the orientation."""
+  def update_image(self):
+    """Advance the current animation and take its frame into use."""
+    self.frame = self.animations[self.current_animation].update_and_get_frame()
+    self.image = self.frame.get_image()
+    return
+
+  def animate(self, static_render = False):
+    """Advance the animation and move the rect to the object's position without drawing anything."""
     if (not static_render) or (self.image == None):
-      self.image = self.animations[self.current_animation].update_and_get_image()
-    if center == None:
-      self.rect.centerx = int(self.x)
-      self.rect.centery = int(self.y)
-    else:
+      self.update_image()
+    self.rect.centerx = int(self.x)
+    self.rect.centery = int(self.y)
+    self.orientation = self.get_orientation()
+    return
+
+  def render(self, surface = None, center = None, static_render = False, alpha = 255):
+    """Render the object - also flips or rotates it visually according to the orientation.
+    Returns the rect drawn on."""
+    self.animate(static_render)
+    if center != None:
       self.rect.centerx = center[0]
       self.rect.centery = center[1]
 
-    self.orientation = self.get_orientation()
-
     drawsurface = self.screen
     if surface != None:
       drawsurface = surface
 
-    image = self.image
-
-    if self.orientation == LEFT:
-      image = pygame.transform.flip(image, True, False)
-    elif self.orientation == UP:
-      image = pygame.transform.rotate(image, 90)
-    elif self.orientation == DOWN:
-      image = pygame.transform.rotate(image, -90)
+    image = self.frame.get_image(self.orientation, alpha)
 
-    image.set_alpha(alpha)
-
-    drawsurface.blit(image, self.rect)
+    drawn = drawsurface.blit(image, self.rect)
 
     if center != None:
       self.rect.centerx = int(self.x)
       self.rect.centery = int(self.y)
-    return
+    return drawn
 
   def get_orientation(self):
     return RIGHT
@@ -1,6 +1,6 @@
 from .variables import variables
 from .locals import *
-from .data import levelpath
+from .data import levelpath, load
 
 
 class World:
@@ -11,7 +11,7 @@ class World:
         self.number = world_index + 1
 
         #Parsing config:
-        conffile = open(levelpath(self.name))
+        conffile = load(levelpath(self.name), "r")
         for line in conffile:
             if line.strip() != "":
                 values = line.split()
@@ -22,6 +22,12 @@ class World:
 
     def is_next_level(self):
         return self.level_index < len(self.levels)
+
+    def peek_level(self):
+        """The level get_level returns next, or None if this was the last one."""
+        if self.is_next_level():
+            return self.levels[self.level_index]
+        return None
     
     def get_level(self, index=None):
         level = ""
@@ -0,0 +1,34 @@
+"""
+Tests of the game code. They run without a display or sound device:
+
+  echo | python -m unittest discover -s tests -t .
+
+The echo answers the resolution multiplier prompt with the default.
+"""
+
+import os
+
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
+
+import pygame
+
+from lib.locals import *
+from lib.variables import variables
+
+#The settings main.py would have read from the config
+for key, default in (("character", 0), ("dialogue", True), ("devmode", False),
+                     ("verbose", False), ("sound", False)):
+    if key not in variables:
+        variables[key] = default
+
+
+def get_screen():
+    """The display surface, set up the way the game does it."""
+    if not pygame.display.get_init():
+        pygame.display.init()
+    screen = pygame.display.get_surface()
+    if screen == None:
+        #The dummy video driver defaults to a depth without alpha masks
+        screen = pygame.display.set_mode((SCREEN_WIDTH, SCREEN_HEIGHT), 0, 32)
+    return screen
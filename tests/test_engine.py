@@ -0,0 +1,29 @@
+import unittest
+
+from lib.locals import *
+from lib.engine import StatefulEngine, RenderCog
+
+
+class RenderCogTest(unittest.TestCase):
+    def test_draw_interval(self):
+        engine = StatefulEngine(FPS)
+        render = engine.add_cog(RenderCog(FPS // 2))
+        drawn = []
+        for frame in range(6):
+            drawn.append(render.due())
+            engine.frame += 1
+        self.assertEqual(drawn, [True, False] * 3)
+
+    def test_bad_framerates(self):
+        engine = StatefulEngine(FPS)
+        for fps in (0, -1, 5, FPS * 2):
+            self.assertRaises(ValueError, engine.add_cog, RenderCog(fps))
+
+    def test_render_framerates(self):
+        engine = StatefulEngine(FPS)
+        for fps in RENDER_FRAMERATES:
+            engine.add_cog(RenderCog(fps))
+
+
+if __name__ == "__main__":
+    unittest.main()
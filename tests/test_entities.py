@@ -0,0 +1,118 @@
+import unittest
+
+import pygame
+
+from lib.entities import EntityRegistry
+from lib.game import update_objects
+
+
+class Thing:
+    def __init__(self, itemclass, x=0, y=0):
+        self.itemclass = itemclass
+        self.x = x
+        self.y = y
+        self.rect = pygame.Rect(x - 5, y - 5, 10, 10)
+
+
+class Counter(Thing):
+    def __init__(self, itemclass):
+        Thing.__init__(self, itemclass)
+        self.dead = False
+        self.updates = 0
+
+    def update(self, level):
+        self.updates += 1
+
+
+class Spawner(Counter):
+    """Spawns a projectile on its first update, like a spider firing."""
+    def __init__(self):
+        Counter.__init__(self, "spider")
+        self.projectile = Counter("projectile")
+
+    def update(self, level):
+        Counter.update(self, level)
+        if self.updates == 1:
+            level.spawn(self.projectile)
+
+
+class Level:
+    def __init__(self, registry):
+        self.registry = registry
+
+    def spawn(self, o):
+        self.registry.add(o)
+
+
+class EntityRegistryTest(unittest.TestCase):
+    def setUp(self):
+        self.registry = EntityRegistry()
+        self.things = [Thing("blob"), Thing("key"), Thing("blob"), Thing("projectile")]
+        for thing in self.things:
+            self.registry.add(thing)
+        self.registry.flush()
+
+    def check_buckets(self):
+        registry = self.registry
+        for itemclass, bucket in registry.buckets.items():
+            self.assertEqual(bucket, [o for o in registry if o.itemclass == itemclass])
+            for position, o in enumerate(bucket):
+                self.assertEqual(registry.bucket_index[o], position)
+
+    def test_add_is_deferred(self):
+        thing = Thing("projectile")
+        self.registry.add(thing)
+        self.assertEqual(len(self.registry), 4)
+        self.assertEqual(self.registry.flush(), [thing])
+        self.assertEqual(len(self.registry.of_class("projectile")), 2)
+        self.check_buckets()
+
+    def test_remove(self):
+        blob, key, other_blob, projectile = self.things
+        self.registry.remove(blob)
+        self.registry.remove(projectile)
+        self.assertEqual(len(self.registry), 4)
+        self.assertEqual(self.registry.flush(), [])
+        self.assertEqual(list(self.registry), [key, other_blob])
+        self.assertEqual(list(self.registry.of_class("blob")), [other_blob])
+        self.assertEqual(list(self.registry.of_class("projectile")), [])
+        self.check_buckets()
+
+    def test_remove_twice(self):
+        self.registry.remove(self.things[0])
+        self.registry.flush()
+        self.registry.remove(self.things[0])
+        self.registry.flush()
+        self.assertEqual(len(self.registry), 3)
+        self.check_buckets()
+
+    def test_drawing_order_is_kept(self):
+        #The player is added last so that it's drawn on top of everything
+        player = Thing("player")
+        self.registry.add(player)
+        self.registry.flush()
+        self.registry.remove(self.things[0])
+        self.registry.remove(self.things[1])
+        self.registry.flush()
+        self.assertEqual(list(self.registry), [self.things[2], self.things[3], player])
+
+    def test_spatial_queries(self):
+        far = Thing("blob", 300, 300)
+        self.registry.add(far)
+        self.registry.flush()
+        self.registry.index()
+        self.assertEqual(self.registry.at_point(300, 300), [far])
+        self.assertEqual(self.registry.overlapping(pygame.Rect(290, 290, 5, 5), "key"), [])
+
+    def test_spawned_objects_update_on_their_frame(self):
+        registry = EntityRegistry()
+        spider = Spawner()
+        registry.add(spider)
+        registry.flush()
+        update_objects(registry, Level(registry), [])
+        self.assertEqual(spider.projectile.updates, 1)
+        self.assertEqual(len(registry.of_class("projectile")), 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
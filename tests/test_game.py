@@ -0,0 +1,54 @@
+import unittest
+
+from tests import get_screen
+from lib.locals import *
+from lib.util import Score
+from lib.variables import variables
+from lib import game
+
+
+def walk_and_jump(frames):
+    inputs = []
+    for frame in range(frames):
+        if frame < 30:
+            inputs.append({"RIGHT": True})
+        elif frame == 30:
+            inputs.append({"JUMP": True, "LEFT": True})
+        else:
+            inputs.append({"LEFT": True})
+    return inputs
+
+
+class HeadlessTest(unittest.TestCase):
+    def setUp(self):
+        self.screen = get_screen()
+
+    def position(self, headless, inputs):
+        result = game.play_level(self.screen, "w0-l0", score=Score(0), headless=headless,
+                                 input_frames=inputs, max_frames=len(inputs))
+        return (result.player.x, result.player.y, result.player.current_animation)
+
+    def test_headless_matches_rendered(self):
+        #Rendered runs hold the objects still while the level fades in and
+        #while dialogue is shown, so compare where the player comes to rest
+        variables["dialogue"] = False
+        try:
+            inputs = [{}] * 48
+            self.assertEqual(self.position(True, inputs), self.position(False, inputs))
+        finally:
+            variables["dialogue"] = True
+
+    def test_headless_input(self):
+        start = self.position(True, [{}])
+        x, y, animation = self.position(True, walk_and_jump(60))
+        self.assertNotEqual((x, y), start[:2])
+        self.assertTrue(y < SCREEN_HEIGHT)
+
+    def test_player_lands_on_tiles(self):
+        result = game.simulate("w0-l0", [{}] * 48, 48)
+        self.assertTrue(result.player.on_ground)
+        self.assertTrue(result.player.rect.bottom < SCREEN_HEIGHT)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,28 @@
+import unittest
+
+from tests import get_screen
+from lib.locals import *
+from lib.ghost import Ghost
+
+
+class GhostTest(unittest.TestCase):
+    def setUp(self):
+        self.screen = get_screen()
+
+    def test_follows_track(self):
+        track = [(100, 200, 0, "default"), (104, 200, 4, "walking"),
+                 (108, 198, 4, "walking"), (112, 196, 4, "jumping")]
+        ghost = Ghost(self.screen, CHARACTERS[0][1], track)
+        for x, y, dx, animation in track:
+            ghost.update()
+            ghost.render()
+            self.assertEqual((ghost.x, ghost.y, ghost.dx, ghost.current_animation),
+                             (x, y, dx, animation))
+            self.assertFalse(ghost.dead)
+        ghost.update()
+        ghost.render()
+        self.assertTrue(ghost.dead)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,68 @@
+import unittest
+
+import pygame
+
+from tests import get_screen
+from lib.locals import *
+from lib.level import Level, prefetch_level, prefetches
+from lib.levelcache import compiled_levels, read_level_data
+from lib.atlas import Atlas, atlases, read_ahead
+
+
+class LevelTest(unittest.TestCase):
+    def setUp(self):
+        self.screen = get_screen()
+
+    def test_build_level(self):
+        level = Level(self.screen, CHARACTERS[0][1], "w0-l0")
+        self.assertTrue(level.get_player() != None)
+        self.assertTrue(len(level.get_objects()) > 0)
+        self.assertTrue(any(level.tile_types[tilex][tiley]
+                            for tilex in range(FULL_TILES_HOR) for tiley in range(FULL_TILES_VER)))
+        self.assertEqual(sorted(level.stale_cells), [0, 1, 2, 3])
+
+    def test_flip_ends_on_level_at_rest(self):
+        level = Level(self.screen, CHARACTERS[0][1], "w0-l0")
+        turning = pygame.Surface((SCREEN_WIDTH, SCREEN_HEIGHT))
+        at_rest = pygame.Surface((SCREEN_WIDTH, SCREEN_HEIGHT))
+        for flip_direction in (CLOCKWISE, COUNTER_CLOCKWISE):
+            level.flip(flip_direction)
+            #The whole turn, as the flip's last frame is one step short of it
+            level.flipcounter = FLIP_FRAMES + 1
+            turning.fill((0, 0, 0))
+            level.render_flipping_tiles(turning)
+            level.flipping = False
+            level.flipcounter = 0
+            level.finish_flip()
+            at_rest.fill((0, 0, 0))
+            level.render_tiles(at_rest)
+            self.assertEqual(pygame.image.tostring(turning, "RGB"), pygame.image.tostring(at_rest, "RGB"))
+
+    def test_prefetch(self):
+        #The saved atlas of the tileset is there, like after an earlier launch
+        data = read_level_data("w2-l0")
+        Atlas(data.tile_set)
+        self.assertFalse(data.tile_set in atlases)
+
+        prefetch_level("w2-l0")
+        thread, files = prefetches["w2-l0"]
+        thread.join()
+        #The worker only read the files, and left everything in memory alone
+        self.assertFalse("w2-l0" in compiled_levels)
+        self.assertFalse(data.tile_set in atlases)
+        self.assertEqual(read_ahead, {})
+        self.assertEqual(files["data"].tiles, data.tiles)
+        self.assertTrue(files["atlases"][data.tile_set] != None)
+
+        level = Level(self.screen, CHARACTERS[0][1], "w2-l0")
+        self.assertFalse("w2-l0" in prefetches)
+        self.assertTrue(compiled_levels["w2-l0"] is files["data"])
+        #The tiles' images are loaded when they're first drawn
+        level.render()
+        self.assertTrue(data.tile_set in atlases)
+        self.assertEqual(read_ahead, {})
+        self.assertEqual(level.tile_set, data.tile_set)
+
+
+if __name__ == "__main__":
+    unittest.main()
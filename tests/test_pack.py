@@ -0,0 +1,79 @@
+# -*- coding: utf-8 -*-
+import os
+import shutil
+import tempfile
+import unittest
+
+import pygame
+
+from lib import data
+from lib.pack import Pack, build_pack
+
+TEXT = u"level w0-l0\nset brown ä\n"
+
+
+class PackTest(unittest.TestCase):
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        self.data_dir = os.path.join(self.root, "data")
+        os.makedirs(os.path.join(self.data_dir, "levels"))
+        os.makedirs(os.path.join(self.data_dir, "pictures"))
+        self.write("levels/w9.txt", TEXT.encode("utf_8"))
+        self.write("levels/loose.txt", b"packed")
+        self.image = open(data.picpath("key", "z"), "rb").read()
+        self.write("pictures/key_z.png", self.image)
+        build_pack(self.data_dir, self.data_dir + ".pack")
+        self.saved = (data.data_dir, data.pack_path, data.pack)
+
+    def tearDown(self):
+        data.data_dir, data.pack_path, data.pack = self.saved
+        shutil.rmtree(self.root)
+
+    def write(self, name, contents):
+        data_file = open(os.path.join(self.data_dir, name), "wb")
+        data_file.write(contents)
+        data_file.close()
+
+    def use_pack(self):
+        """Point the data module at the pack, with only the file loose.txt left loose."""
+        for name in ("levels/w9.txt", "pictures/key_z.png"):
+            os.remove(os.path.join(self.data_dir, name))
+        self.write("levels/loose.txt", b"loose")
+        data.data_dir = self.data_dir
+        data.pack_path = self.data_dir + ".pack"
+        data.pack = None
+
+    def test_index(self):
+        pack = Pack(self.data_dir + ".pack")
+        self.assertEqual(pack.names, sorted(pack.names))
+        self.assertEqual(pack.list("levels"), ["loose.txt", "w9.txt"])
+        self.assertEqual(pack.read("pictures/key_z.png"), self.image)
+        self.assertEqual(pack.read("pictures/missing.png"), None)
+
+    def test_rebuild(self):
+        pack = Pack(self.data_dir + ".pack")
+        build_pack(self.data_dir, self.data_dir + ".pack")
+        self.assertEqual(Pack(self.data_dir + ".pack").names, pack.names)
+
+    def test_load_text(self):
+        self.use_pack()
+        level_file = data.load(data.levelpath("w9"), "r")
+        self.assertEqual(level_file.read(), TEXT)
+        self.assertEqual(data.load(data.levelpath("loose"), "r").read(), u"loose")
+
+    def test_load_binary(self):
+        self.use_pack()
+        self.assertEqual(data.load(data.picpath("key", "z")).read(), self.image)
+        image = pygame.image.load(data.load(data.picpath("key", "z")), data.picpath("key", "z"))
+        self.assertTrue(image.get_width() > 0)
+
+    def test_files(self):
+        self.use_pack()
+        self.assertTrue(data.exists(data.levelpath("w9")))
+        self.assertFalse(data.exists(data.levelpath("w8")))
+        self.assertEqual(data.listdir("levels"), ["loose.txt", "w9.txt"])
+        self.assertEqual(data.getmtime(data.levelpath("w9")), data.get_pack().mtime)
+
+
+if __name__ == "__main__":
+    unittest.main()
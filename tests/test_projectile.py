@@ -0,0 +1,50 @@
+import unittest
+
+from tests import get_screen
+from lib.locals import *
+from lib.level import Level
+from lib.projectile import Projectile
+
+
+class ProjectileTest(unittest.TestCase):
+    def setUp(self):
+        self.screen = get_screen()
+        self.level = Level(self.screen, CHARACTERS[0][1], "w0-l0")
+
+    def wall_between(self):
+        """Two free points on a row with a wall between them."""
+        level = self.level
+        for y in range(TILE_DIM // 2, SCREEN_HEIGHT, TILE_DIM):
+            free = None
+            wall = False
+            for x in range(TILE_DIM // 2, SCREEN_WIDTH, TILE_DIM):
+                if level.point_on_tiles(x, y):
+                    wall = free != None
+                elif wall:
+                    return (free, y), (x, y)
+                else:
+                    free = x
+        self.fail("No wall between free cells in the level")
+
+    def test_flight_hits_wall(self):
+        start, end = self.wall_between()
+        projectile = Projectile(self.screen, start[0], start[1], end[0] - start[0], 0)
+        projectile.update(self.level)
+        self.assertEqual(projectile.current_animation, "dying")
+
+    def test_flip_is_not_swept(self):
+        start, end = self.wall_between()
+        projectile = Projectile(self.screen, start[0], start[1], 0, 0)
+        #The last frame of a clockwise flip, ending at the other side of the wall
+        projectile.flipping = True
+        projectile.flip_direction = CLOCKWISE
+        projectile.flipcounter = FLIP_FRAMES
+        projectile.flip_offset = (end[1] - PLAY_AREA_CENTER_Y, PLAY_AREA_CENTER_X - end[0])
+        projectile.update(self.level)
+        self.assertAlmostEqual(projectile.x, end[0])
+        self.assertAlmostEqual(projectile.y, end[1])
+        self.assertEqual(projectile.current_animation, "default")
+
+
+if __name__ == "__main__":
+    unittest.main()
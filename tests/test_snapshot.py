@@ -0,0 +1,73 @@
+import unittest
+
+from tests import get_screen
+from lib.locals import *
+from lib.util import Score
+from lib.level import Level
+from lib.projectile import Projectile
+from lib import game
+
+
+def object_state(o):
+    animation = o.animations[o.current_animation]
+    return (o.itemclass, o.x, o.y, getattr(o, "dx", None), getattr(o, "dy", None),
+            getattr(o, "life", None), o.dead, o.flipping, tuple(o.rect),
+            o.current_animation, animation.i, animation.c, animation.finished)
+
+
+def level_state(level):
+    objects = level.get_objects()
+    return {
+        "player": object_state(level.get_player()),
+        "inventory": list(level.get_player().inventory),
+        "objects": [object_state(o) for o in objects],
+        "buckets": dict((itemclass, list(bucket)) for itemclass, bucket in objects.buckets.items()),
+        "indices": dict(objects.bucket_index),
+        "tiles": [bytes(column) for column in level.tile_types],
+        "ground": [list(column) for column in level.ground_cells],
+        "flip": (level.orientation, level.flipping, level.flipcounter),
+        "events": [(event.counter, event.repeated) for event in level.get_scripted_events()],
+    }
+
+
+class SnapshotTest(unittest.TestCase):
+    def setUp(self):
+        self.screen = get_screen()
+        self.level = Level(self.screen, CHARACTERS[0][1], "w0-l0")
+        objects = self.level.get_objects()
+        objects.add(self.level.get_player())
+        objects.flush()
+        objects.index()
+
+    def test_restore(self):
+        level = self.level
+        loaded = level_state(level)
+        snapshot = level.snapshot()
+
+        inputs = [({"JUMP": True} if frame % 6 == 0 else {"LEFT": True}) for frame in range(120)]
+        game.play_level(self.screen, "w0-l0", score=Score(0), headless=True, input_frames=inputs,
+                        max_frames=120, seed=1, snapshot=snapshot)
+        level.spawn(Projectile(self.screen, 100, 100, 5, 0))
+        level.get_objects().remove(level.get_objects().of_class("spider")[0])
+        level.get_objects().flush()
+        level.flip(CLOCKWISE)
+        for frame in range(FLIP_FRAMES + 1):
+            level.update()
+        self.assertNotEqual(level_state(level), loaded)
+
+        self.assertTrue(snapshot.restore() is level)
+        self.assertEqual(level_state(level), loaded)
+
+        #The snapshot can be restored again after playing the restored level
+        game.play_level(self.screen, "w0-l0", score=Score(0), headless=True, input_frames=inputs,
+                        max_frames=120, seed=1, snapshot=snapshot)
+        snapshot.restore()
+        self.assertEqual(level_state(level), loaded)
+
+    def test_only_restartable_runs_snapshot(self):
+        result = game.simulate("w0-l0", [{}] * 5, 5)
+        self.assertEqual(result.snapshot, None)
+
+
+if __name__ == "__main__":
+    unittest.main()